@@ -0,0 +1,121 @@
+# Background worker for slow GUI actions.
+#
+# Data loading, prediction and figure building run on a thread pool so the Tk
+# main loop (and its animations) never blocks. Finished results are handed
+# back to the main thread by a poll scheduled with app.after, because Tk
+# widgets may only be touched from the thread running mainloop.
+#
+# Tasks are submitted under a channel name. A new submission on a channel
+# supersedes the previous one: the old task is flagged as cancelled, stops at
+# its next checkpoint, and its result is discarded.
+import queue
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class Task:
+    def __init__(self, channel, generation):
+        self.channel = channel
+        self.generation = generation
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    # Called by task functions between phases to stop superseded work early
+    def checkpoint(self):
+        if self.cancelled:
+            raise TaskCancelled()
+
+
+class BackgroundRunner:
+    def __init__(self, app, max_workers=2, poll_ms=30, on_busy=None):
+        self.app = app
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gui-worker")
+        self.results = queue.Queue()
+        self.active = {}
+        self.polling = False
+
+    # Run func(task, *args) in the background; on_done(result) or
+    # on_error(exception) is later called on the Tk main thread
+    def submit(self, channel, func, on_done, on_error=None, *args):
+        previous = self.active.get(channel)
+        if previous is not None:
+            previous.cancel()
+        task = Task(channel, previous.generation + 1 if previous else 0)
+        self.active[channel] = task
+        self.executor.submit(self._run, task, func, on_done, on_error, args)
+        self._set_busy(True)
+        if not self.polling:
+            self.polling = True
+            self.app.after(self.poll_ms, self._poll)
+        return task
+
+    def cancel(self, channel):
+        task = self.active.pop(channel, None)
+        if task is not None:
+            task.cancel()
+        self._set_busy(bool(self.active))
+
+    @property
+    def busy(self):
+        return bool(self.active)
+
+    def shutdown(self):
+        for task in self.active.values():
+            task.cancel()
+        self.active.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, task, func, on_done, on_error, args):
+        try:
+            task.checkpoint()
+            result = func(task, *args)
+        except TaskCancelled:
+            return
+        except Exception as e:
+            self.results.put((task, on_error, e))
+            return
+        self.results.put((task, on_done, result))
+
+    def _set_busy(self, busy):
+        if self.on_busy:
+            self.on_busy(busy)
+
+    # Deliver finished results on the main thread, dropping superseded ones.
+    # A callback that raises is reported and skipped, and the next poll is
+    # always scheduled, so one failing view cannot stall every later task.
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    task, callback, value = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if task.cancelled or self.active.get(task.channel) is not task:
+                    continue
+                del self.active[task.channel]
+                self._set_busy(bool(self.active))
+                if callback:
+                    try:
+                        callback(value)
+                    except Exception:
+                        print(f"Callback of background task {task.channel!r} failed:", file=sys.stderr)
+                        traceback.print_exc()
+        finally:
+            if self.active:
+                self.app.after(self.poll_ms, self._poll)
+            else:
+                self.polling = False
@@ -0,0 +1,219 @@
+# Reproducible performance benchmarks for the cloudburst prediction system.
+#
+# Synthetic datasets shaped like processed_disaster_data.csv are generated at
+# each requested size (rows are resampled from the real data with a little
+# noise, one hour apart, from a fixed seed) and cached under .cache/benchmark/.
+# For every size the suite times CSV parsing into the dataset store, single-row
+# and batched model.predict, the train/test split plus evaluation, and the
+# app's own comparison and weather figures (figures.py) drawn on the headless
+# Agg backend. The model load, pickled and from a compact export
+# (model_format.py), is timed once. The default sizes finish quickly;
+# --large adds 10^6 and 10^7 rows, which take minutes and leave large
+# datasets in the cache.
+#
+#   python benchmark.py --sizes 1000 100000 --output results.json
+#   python benchmark.py --large                # include the large sizes
+#   python benchmark.py --save-baseline        # record this machine's baseline
+#   python benchmark.py                        # compare against it
+#
+# Every timing is the best of --repeat runs. A timing that is more than
+# --tolerance slower than the baseline is reported as a regression and the
+# command exits with status 1.
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from scoring import DATA_PATH, MODEL_PATH, script_dir
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+BENCHMARK_DIR = os.path.join(script_dir, '.cache', 'benchmark')
+BASELINE_PATH = os.path.join(script_dir, 'benchmark_baseline.json')
+DEFAULT_SIZES = [10 ** 3, 10 ** 4, 10 ** 5]
+# Added by --large
+LARGE_SIZES = [10 ** 6, 10 ** 7]
+DEFAULT_REPEAT = 3
+# Allowed slowdown against the baseline before a timing counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Slowdowns smaller than this are timer noise, whatever the ratio
+NOISE_FLOOR = 0.005
+SEED = 42
+# Rows generated and written per chunk, to bound memory at 10^7 rows
+GENERATE_CHUNK = 1_000_000
+# Single-row predictions timed per repeat
+SINGLE_CALLS = 20
+FEATURES = ['temp', 'wspd', 'rhum', 'pres']
+
+
+# Path of the synthetic dataset with `rows` rows, generated on first use
+def synthetic_dataset(rows, directory=BENCHMARK_DIR):
+    path = os.path.join(directory, f'synthetic_{rows}.csv')
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        generate_dataset(rows, tmp_path)
+        os.replace(tmp_path, path)
+    return path
+
+
+def generate_dataset(rows, path, source=DATA_PATH, seed=SEED):
+    import pandas as pd
+
+    reference = pd.read_csv(source)
+    numeric = reference.drop(columns=['time'])
+    noisy = [c for c in numeric.columns if c not in ('coco', 'disaster')]
+    scale = numeric[noisy].std().to_numpy() * 0.05
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2000-01-01')
+
+    for offset in range(0, rows, GENERATE_CHUNK):
+        count = min(GENERATE_CHUNK, rows - offset)
+        chunk = numeric.iloc[rng.integers(0, len(numeric), count)].reset_index(drop=True)
+        chunk[noisy] = (chunk[noisy].to_numpy() + rng.normal(0.0, scale, (count, len(noisy)))).round(1)
+        chunk.insert(0, 'time', start + pd.to_timedelta(np.arange(offset, offset + count), unit='h'))
+        chunk.to_csv(path, mode='w' if offset == 0 else 'a', header=offset == 0, index=False)
+
+
+# Best wall-clock time of `repeat` calls to func()
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, model_path=MODEL_PATH, log=print):
+    import joblib
+    import pandas as pd
+    from background_tasks import Task
+    from dataset_store import DatasetStore, _stores, get_store
+    from evaluation_cache import compute_evaluation
+    import figures
+    import model_format
+    from scoring import score_batch
+
+    # The first load also imports sklearn; time warm loads only
+    model = joblib.load(model_path)
+    results = {}
+    results['model_load'] = best_time(lambda: joblib.load(model_path), repeat)
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    compact = os.path.join(BENCHMARK_DIR, 'model' + model_format.SUFFIX)
+    model_format.export(model, compact)
+    results['compact_model_load'] = best_time(lambda: model_format.load(compact), repeat)
+    forest = model_format.load(compact)
+    log(f"model_load: {results['model_load']:.4f}s, compact_model_load: {results['compact_model_load']:.4f}s")
+    # Builders take the task they run in; this one is never cancelled
+    task = Task('benchmark', 0)
+
+    # Each timing includes drawing the figure, as the app's canvas does
+    def draw(result):
+        result[0].canvas.draw()
+
+    # Font and text caches are filled by the first draw in the process
+    draw(figures.build_comparison_figure(task, pd.Series(0.0, index=FEATURES), np.zeros(len(FEATURES))))
+
+    for rows in sizes:
+        path = synthetic_dataset(rows)
+        timings = {}
+        timings['csv_parse'] = best_time(lambda: DatasetStore(path), repeat)
+        # Evaluation reads through the shared store, like the app
+        store = get_store(path)
+        X = store.frame[FEATURES]
+
+        single = X.iloc[:1]
+        timings['predict_single'] = best_time(
+            lambda: [model.predict(single) for _ in range(SINGLE_CALLS)], repeat) / SINGLE_CALLS
+        timings['predict_batch'] = best_time(lambda: model.predict(X), repeat)
+        timings['fast_predict_batch'] = best_time(lambda: score_batch(forest, X), repeat)
+        timings['split_evaluation'] = best_time(lambda: compute_evaluation(model, path), repeat)
+
+        comparison = store.comparison(FEATURES)
+        inputs = X.iloc[0].to_numpy()
+        timings['comparison_figure'] = best_time(
+            lambda: draw(figures.build_comparison_figure(task, comparison, inputs)), repeat)
+        # First build includes the pyramids; later ones reuse them like the app
+        start = time.perf_counter()
+        draw(figures.build_weather_figure(task, None, path))
+        timings['weather_figure_first'] = time.perf_counter() - start
+        timings['weather_figure'] = best_time(
+            lambda: draw(figures.build_weather_figure(task, None, path)), repeat)
+
+        _stores.pop(path, None)
+        for name, seconds in timings.items():
+            results[f'{name}[{rows}]'] = seconds
+        log(f"{rows:>10,} rows: " + ", ".join(f"{name} {seconds:.4f}s" for name, seconds in timings.items()))
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count(),
+        },
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+# (name, baseline, current, ratio) for every timing slower than the tolerance allows
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    for name, seconds in report['results'].items():
+        base = baseline['results'].get(name)
+        if base and seconds > base * (1 + tolerance) and seconds - base > NOISE_FLOOR:
+            regressions.append((name, base, seconds, seconds / base))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loading, inference and rendering.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="synthetic dataset sizes in rows")
+    parser.add_argument('--large', action='store_true',
+                        help=f"also run {', '.join(f'{n:,}' for n in LARGE_SIZES)} rows")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="runs per timing, best is kept")
+    parser.add_argument('--model', default=MODEL_PATH, help="path to the pickled model")
+    parser.add_argument('-o', '--output', help="write the JSON report here")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown before a timing is flagged, e.g. 0.25 for 25%%")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes + [n for n in LARGE_SIZES if args.large and n not in args.sizes]
+    report = run(sizes, args.repeat, args.model)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.tolerance)
+    for name, base, seconds, ratio in regressions:
+        print(f"REGRESSION {name}: {base:.4f}s -> {seconds:.4f}s ({ratio:.2f}x)")
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
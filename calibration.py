@@ -0,0 +1,224 @@
+# Calibrated risk scores and a precomputed alert-threshold table.
+#
+# The forest's disaster probability is mapped to a calibrated risk with a
+# Platt sigmoid fitted on the held-out split from evaluation_cache. The
+# split is a few dozen rows, too few for an isotonic fit, which collapses to
+# a 0/1 step when the classes separate; the sigmoid is fitted to Platt's
+# smoothed targets, so it stays graded and finite. It is stored as a dense
+# piecewise-linear table. The threshold table must not be scored with the
+# map fitted on the same rows, which would grade the fit on its own data,
+# so the split is cross-fitted: it is cut into stratified folds, and each
+# fold's rows get the risk of a map fitted on the other folds. For every
+# alert threshold on a 0.01 grid, the table holds the confusion counts and
+# the precision, recall, false-positive rate and alert rate of those
+# out-of-fold risks, and the calibrated Brier score is theirs too. The map
+# the app uses is fitted on the whole split.
+# Changing the threshold is then an index into the table, with no
+# re-scoring or re-evaluation.
+#
+# The fit is stored as JSON next to the model
+# (refined_disaster_prediction_model.calibration.json). Like the evaluation
+# cache, it is keyed on the hash the model was loaded with and the dataset's
+# mtime and size, and it is held in memory after the first use.
+#
+#   python calibration.py                    # fit (or load) and print the table
+#   python calibration.py --threshold 0.3    # metrics at one threshold
+import argparse
+import json
+import os
+
+import numpy as np
+
+from evaluation_cache import RANDOM_STATE, cache_key, evaluate
+from scoring import DATA_PATH, MODEL_PATH, disaster_probability, load_model
+
+FORMAT_VERSION = 2
+# Thresholds 0.00, 0.01, ..., 1.00
+THRESHOLD_STEPS = 101
+DEFAULT_THRESHOLD = 0.5
+# Folds of the held-out split for the out-of-fold risks
+CV_FOLDS = 5
+# Points of the probability grid the sigmoid is tabulated on
+KNOTS = 1001
+
+_calibrations = {}
+
+
+def calibration_path(model_path=MODEL_PATH):
+    return os.path.splitext(model_path)[0] + '.calibration.json'
+
+
+# Confusion counts and rates at every threshold, from one sort of the scores
+def threshold_table(risk, y, thresholds):
+    positives = np.sort(risk[y == 1])
+    negatives = np.sort(risk[y != 1])
+    # An alert is raised when risk >= threshold
+    tp = len(positives) - np.searchsorted(positives, thresholds, side='left')
+    fp = len(negatives) - np.searchsorted(negatives, thresholds, side='left')
+    fn = len(positives) - tp
+    tn = len(negatives) - fp
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        recall = tp / len(positives) if len(positives) else np.zeros(len(thresholds))
+        fpr = fp / len(negatives) if len(negatives) else np.zeros(len(thresholds))
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {
+        'threshold': thresholds, 'tp': tp, 'fp': fp, 'tn': tn, 'fn': fn,
+        'precision': precision, 'recall': recall, 'fpr': fpr, 'f1': f1,
+        'alert_rate': (tp + fp) / len(risk),
+    }
+
+
+class Calibration:
+    def __init__(self, key, knots, table, metrics):
+        self.key = key
+        # Fitted sigmoid as a piecewise-linear map from probability to risk
+        self.knots_x = np.asarray(knots[0], dtype=np.float64)
+        self.knots_y = np.asarray(knots[1], dtype=np.float64)
+        self.table = {name: np.asarray(column) for name, column in table.items()}
+        self.metrics = metrics
+
+    # Calibrated risk for raw disaster probabilities
+    def risk(self, probability):
+        return np.interp(probability, self.knots_x, self.knots_y)
+
+    # Held-out metrics at a threshold: one table lookup
+    def at(self, threshold):
+        i = min(max(int(round(threshold * (THRESHOLD_STEPS - 1))), 0), THRESHOLD_STEPS - 1)
+        return {name: column[i].item() for name, column in self.table.items()}
+
+    def to_dict(self):
+        return {
+            'version': FORMAT_VERSION,
+            'key': self.key,
+            'knots': [self.knots_x.tolist(), self.knots_y.tolist()],
+            'table': {name: column.tolist() for name, column in self.table.items()},
+            'metrics': self.metrics,
+        }
+
+    @classmethod
+    def from_dict(cls, stored):
+        return cls(stored['key'], stored['knots'], stored['table'], stored['metrics'])
+
+
+# Platt scaling: a logistic fit of the labels on the probability, with the
+# targets pulled off 0 and 1 by one pseudo-count per class. Each row enters
+# as a positive and a negative with the target as weights.
+def _sigmoid_knots(probability, y):
+    from sklearn.linear_model import LogisticRegression
+    positives = int(np.sum(y == 1))
+    negatives = len(y) - positives
+    target = np.where(y == 1, (positives + 1) / (positives + 2), 1 / (negatives + 2))
+    X = np.concatenate([probability, probability]).reshape(-1, 1)
+    labels = np.concatenate([np.ones(len(y)), np.zeros(len(y))])
+    weights = np.concatenate([target, 1 - target])
+    fitted = LogisticRegression(C=1e6).fit(X, labels, sample_weight=weights)
+    grid = np.linspace(0.0, 1.0, KNOTS)
+    return grid, fitted.predict_proba(grid.reshape(-1, 1))[:, 1]
+
+
+# Risk of every row from a map fitted without its fold
+def out_of_fold_risk(probability, y, folds=CV_FOLDS):
+    from sklearn.model_selection import StratifiedKFold
+    folds = min(folds, int(np.sum(y == 1)), int(np.sum(y != 1)))
+    if folds < 2:
+        raise ValueError("The held-out split needs at least two disasters and two non-disasters to calibrate")
+    risk = np.empty(len(y), dtype=np.float64)
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE)
+    for fit_index, score_index in splitter.split(probability, y):
+        knots = _sigmoid_knots(probability[fit_index], y[fit_index])
+        risk[score_index] = np.interp(probability[score_index], *knots)
+    return risk, folds
+
+
+def fit(model, data_path=DATA_PATH):
+    from sklearn.metrics import brier_score_loss, roc_auc_score
+    from dataset_store import get_store
+
+    evaluation = evaluate(model, data_path)
+    X = get_store(data_path).frame[list(model.feature_names_in_)].iloc[evaluation.test_index]
+    y = np.asarray(evaluation.y_test)
+    probability = disaster_probability(model, model.predict_proba(X))
+
+    risk, folds = out_of_fold_risk(probability, y)
+    knots = _sigmoid_knots(probability, y)
+    thresholds = np.round(np.linspace(0.0, 1.0, THRESHOLD_STEPS), 2)
+    metrics = {
+        'rows': int(len(y)),
+        'positives': int(np.sum(y == 1)),
+        'folds': folds,
+        'brier_raw': float(brier_score_loss(y, probability)),
+        'brier_calibrated': float(brier_score_loss(y, risk)),
+    }
+    if 0 < metrics['positives'] < len(y):
+        metrics['roc_auc'] = float(roc_auc_score(y, probability))
+    return Calibration(cache_key(model, data_path), knots, threshold_table(risk, y, thresholds), metrics)
+
+
+def _load(path, key):
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+        if stored.get('version') != FORMAT_VERSION or stored.get('key') != key:
+            return None
+        return Calibration.from_dict(stored)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _save(path, calibration):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(calibration.to_dict(), f)
+    os.replace(tmp_path, path)
+
+
+# Calibration of the model, from memory, from the JSON next to model_path,
+# or fresh
+def get_calibration(model, model_path=MODEL_PATH, data_path=DATA_PATH):
+    key = cache_key(model, data_path)
+    if key in _calibrations:
+        return _calibrations[key]
+    path = calibration_path(model_path)
+    calibration = _load(path, key)
+    if calibration is None:
+        calibration = fit(model, data_path)
+        try:
+            _save(path, calibration)
+        except OSError:
+            pass  # Read-only install: keep the in-memory copy only
+    _calibrations.clear()
+    _calibrations[key] = calibration
+    return calibration
+
+
+def format_row(row):
+    return (f"{row['threshold']:>9.2f} {row['precision']:>9.3f} {row['recall']:>7.3f} {row['fpr']:>7.3f} "
+            f"{row['f1']:>7.3f} {row['alert_rate']:>7.3f} {row['tp']:>5} {row['fp']:>5} {row['fn']:>5}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit calibrated risk scores and print the alert-threshold table.")
+    parser.add_argument('--model', default=MODEL_PATH, help="path to the pickled model")
+    parser.add_argument('--data', default=DATA_PATH, help="labelled dataset the held-out split is taken from")
+    parser.add_argument('--threshold', type=float, help="print the metrics at this threshold only")
+    args = parser.parse_args(argv)
+
+    calibration = get_calibration(load_model(args.model), args.model, args.data)
+    metrics = calibration.metrics
+    print(f"Held-out rows: {metrics['rows']} ({metrics['positives']} disasters), "
+          f"scored out of fold over {metrics['folds']} folds")
+    print(f"Brier score: {metrics['brier_raw']:.4f} raw, {metrics['brier_calibrated']:.4f} calibrated")
+    if 'roc_auc' in metrics:
+        print(f"ROC AUC: {metrics['roc_auc']:.4f}")
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>7} {'fpr':>7} {'f1':>7} {'alerts':>7} "
+          f"{'tp':>5} {'fp':>5} {'fn':>5}")
+    if args.threshold is not None:
+        print(format_row(calibration.at(args.threshold)))
+        return
+    for threshold in np.arange(0.05, 1.0, 0.05):
+        print(format_row(calibration.at(threshold)))
+
+
+if __name__ == '__main__':
+    main()
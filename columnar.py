@@ -0,0 +1,216 @@
+# Columnar binary archives for weather datasets.
+#
+# A CSV is converted once into a directory holding one .npy file per column
+# plus meta.json. A column whose every value is a whole number is stored as
+# int64, any other numeric column as float32 (the dtype the trees compare
+# against), and ``time`` as int64 nanoseconds since the epoch. The dtype is
+# settled over the whole file, not the first chunk: an integer column meeting
+# a fraction or an empty cell is promoted to float32, and text that is not a
+# number is rejected with the row it is on. Columns are opened with
+# np.load(mmap_mode='r'), so opening an archive reads no data and a scorer
+# touches only the columns it asks for.
+#
+# meta.json records the size and mtime of the CSV the archive was built from;
+# a CSV's archive is only used while that CSV is unchanged, otherwise readers
+# fall back to parsing the CSV.
+#
+#   python columnar.py processed_disaster_data.csv
+#   python columnar.py archive.csv -o archive.cols --chunksize 500000
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Version 1 archives could hold integer columns truncated by the first chunk's
+# dtype; they are ignored until converted again
+FORMAT_VERSION = 2
+META_FILE = 'meta.json'
+SUFFIX = '.cols'
+TIME_COLUMN = 'time'
+# Rows parsed per chunk while converting
+DEFAULT_CHUNKSIZE = 500_000
+
+
+# Default archive location for a CSV: data.csv -> data.cols
+def columnar_path(csv_path):
+    return os.path.splitext(csv_path)[0] + SUFFIX
+
+
+def is_columnar(path):
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+# Data rows in a CSV, counted from its line breaks without parsing. Lines
+# holding only whitespace are not counted, as pandas skips them
+def _count_rows(path):
+    lines = 0
+    pending = False  # the line running into the next block has text on it
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 22), b''):
+            data = np.frombuffer(block, dtype=np.uint8)
+            newline = data == ord('\n')
+            text = ~(newline | (data == ord(' ')) | (data == ord('\t')) | (data == ord('\r')))
+            # Text characters up to each position; a line has text when the
+            # count grows between its line break and the previous one
+            seen = np.cumsum(text, dtype=np.int32)
+            ends = np.flatnonzero(newline)
+            if len(ends):
+                per_line = np.diff(seen[ends], prepend=0)
+                per_line[0] += pending
+                lines += int(np.count_nonzero(per_line))
+                pending = bool(seen[-1] > seen[ends[-1]])
+            else:
+                pending = pending or bool(seen[-1])
+    lines += pending
+    return max(lines - 1, 0)
+
+
+# Numbers of one column of a chunk, int64 when every value is a whole number
+def _numeric(csv_path, name, series, first_row):
+    if series.dtype == bool:
+        return series.to_numpy(np.int64)
+    values = pd.to_numeric(series, errors='coerce')
+    bad = np.flatnonzero(values.isna().to_numpy() & series.notna().to_numpy())
+    if len(bad):
+        raise ValueError(f"{csv_path}, row {first_row + bad[0] + 1}: {name} = {series.iloc[bad[0]]!r} "
+                         f"is not a number")
+    values = values.to_numpy()
+    if values.dtype.kind in 'iu':
+        return values.astype(np.int64, copy=False)
+    return values
+
+
+# Convert a CSV into a columnar archive, one chunk at a time so files larger
+# than memory can be converted. The archive is written next to its final
+# location and renamed into place when complete.
+def convert(csv_path, out_path=None, chunksize=DEFAULT_CHUNKSIZE):
+    out_path = out_path or columnar_path(csv_path)
+    rows = _count_rows(csv_path)
+    tmp_path = out_path + '.tmp'
+    os.makedirs(tmp_path, exist_ok=True)
+
+    columns = {}
+    # Columns promoted to float32 are written to a second file, renamed over
+    # the first once every mapping is closed
+    promoted = {}
+    written = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        stop = written + len(chunk)
+        if stop > rows:
+            raise ValueError(f"{csv_path} has more rows than line breaks; quoted newlines are not supported")
+        for name in chunk.columns:
+            if name == TIME_COLUMN:
+                values = pd.to_datetime(chunk[name]).to_numpy('datetime64[ns]').view(np.int64)
+            else:
+                values = _numeric(csv_path, name, chunk[name], written)
+            column = columns.get(name)
+            if column is None:
+                dtype = np.int64 if values.dtype.kind == 'i' else np.float32
+                column = np.lib.format.open_memmap(os.path.join(tmp_path, name + '.npy'),
+                                                   mode='w+', dtype=dtype, shape=(rows,))
+            elif column.dtype.kind == 'i' and values.dtype.kind != 'i':
+                promoted[name] = os.path.join(tmp_path, name + '.float.npy')
+                floats = np.lib.format.open_memmap(promoted[name], mode='w+', dtype=np.float32, shape=(rows,))
+                for start in range(0, written, chunksize):
+                    floats[start:min(start + chunksize, written)] = column[start:min(start + chunksize, written)]
+                column = floats
+            columns[name] = column
+            column[written:stop] = values
+        written = stop
+    if written != rows:
+        raise ValueError(f"Expected {rows} rows in {csv_path}, parsed {written}")
+
+    for column in columns.values():
+        column.flush()
+    meta = {
+        'version': FORMAT_VERSION,
+        'rows': rows,
+        'columns': {name: column.dtype.str for name, column in columns.items()},
+        'source': _signature(csv_path),
+    }
+    columns.clear()
+    for name, path in promoted.items():
+        os.replace(path, os.path.join(tmp_path, name + '.npy'))
+    with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    if os.path.isdir(out_path):
+        for name in os.listdir(out_path):
+            os.remove(os.path.join(out_path, name))
+        os.rmdir(out_path)
+    os.replace(tmp_path, out_path)
+    return ColumnarDataset(out_path)
+
+
+class ColumnarDataset:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version {self.meta.get('version')} in {path}")
+        self.columns = list(self.meta['columns'])
+        self._arrays = {}
+
+    def __len__(self):
+        return self.meta['rows']
+
+    # Memory-mapped, read-only column; nothing is read until it is indexed
+    def column(self, name):
+        if name not in self._arrays:
+            if name not in self.meta['columns']:
+                raise KeyError(f"No column {name!r} in {self.path}")
+            self._arrays[name] = np.load(os.path.join(self.path, name + '.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+    @property
+    def time(self):
+        return pd.DatetimeIndex(self.column(TIME_COLUMN).view('datetime64[ns]'), name=TIME_COLUMN)
+
+    # DataFrame over the mapped columns without copying them, indexed by time
+    # when the archive has a time column
+    def frame(self, columns=None):
+        names = [name for name in (columns or self.columns) if name != TIME_COLUMN]
+        index = self.time if TIME_COLUMN in self.columns else None
+        return pd.DataFrame({name: self.column(name) for name in names}, index=index, copy=False)
+
+    # True if the archive was built from csv_path as it is now
+    def matches(self, csv_path):
+        return self.meta.get('source') == _signature(csv_path)
+
+
+# The archive built from csv_path, or None if there is none or it is stale
+def open_for(csv_path):
+    path = columnar_path(csv_path)
+    if not is_columnar(path):
+        return None
+    try:
+        dataset = ColumnarDataset(path)
+    except (OSError, ValueError):
+        return None
+    return dataset if dataset.matches(csv_path) else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a weather CSV into a columnar binary archive.")
+    parser.add_argument('input', help="CSV file to convert")
+    parser.add_argument('-o', '--output', help="archive directory (default: <input>.cols)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="rows parsed per chunk")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    dataset = convert(args.input, args.output, args.chunksize)
+    print(f"Wrote {len(dataset)} rows x {len(dataset.columns)} columns to {dataset.path} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Shared in-memory store for the reference dataset.
+#
+# The CSV is read and parsed once, with ``time`` as a DatetimeIndex, and the
+# per-feature statistics (including the means the comparison plot uses) are
+# computed up front. Every consumer gets the same frame; columns handed out by
+# column()/values() are views of it, so button presses do no disk I/O or
+# parsing. get_store() reloads only when the file's mtime or size changes.
+#
+# When the CSV has an up-to-date columnar archive next to it (see columnar.py),
+# or the path is an archive itself, the frame is built over the archive's
+# memory-mapped columns instead of parsing text.
+import os
+
+import pandas as pd
+
+import columnar
+from instrumentation import stage
+from scoring import DATA_PATH
+
+
+class DatasetStore:
+    def __init__(self, path=DATA_PATH):
+        self.path = path
+        self.signature = _signature(path)
+        archive = columnar.ColumnarDataset(path) if columnar.is_columnar(path) else columnar.open_for(path)
+        self.source = archive.path if archive is not None else path
+        with stage("data load"):
+            if archive is not None:
+                self.frame = archive.frame()
+            else:
+                self.frame = pd.read_csv(path, parse_dates=['time'], index_col='time')
+            # count/mean/std/min/quartiles/max for every numeric column
+            self.stats = self.frame.describe().T
+        self._pyramids = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def time(self):
+        return self.frame.index
+
+    # Dataset means of the given features, in the given order
+    def comparison(self, features):
+        return self.stats.loc[list(features), 'mean']
+
+    def column(self, name):
+        return self.frame[name]
+
+    # Read-only NumPy view of a column
+    def values(self, name):
+        values = self.frame[name].to_numpy()
+        values.flags.writeable = False
+        return values
+
+    # Min/max level-of-detail pyramid of a column against matplotlib date
+    # numbers, built on first use
+    def pyramid(self, name):
+        if name not in self._pyramids:
+            import matplotlib.dates as mdates
+            from lod import MinMaxPyramid
+            self._pyramids[name] = MinMaxPyramid(mdates.date2num(self.time), self.values(name))
+        return self._pyramids[name]
+
+    def is_current(self):
+        return _signature(self.path) == self.signature
+
+
+# (mtime, size) of a CSV, or of an archive's metadata
+def _signature(path):
+    if columnar.is_columnar(path):
+        path = os.path.join(path, columnar.META_FILE)
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+_stores = {}
+
+
+# The shared store for a dataset file, loaded on first use
+def get_store(path=DATA_PATH):
+    store = _stores.get(path)
+    if store is None or not store.is_current():
+        store = _stores[path] = DatasetStore(path)
+    return store
@@ -1,33 +1,57 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.ensemble import RandomForestClassifier
-import joblib
-from tkinter import Tk, Label, Entry, Button, StringVar, messagebox, Canvas, Scrollbar, Frame
-from tkinter import ttk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay
-from sklearn.model_selection import train_test_split
+import time
+startup_clock = time.perf_counter()
+
+# Only tkinter is imported up front so the window paints first; pandas,
+# matplotlib, sklearn and the model are loaded in the background or on
+# first use of the button that needs them
+from tkinter import Tk, Label, Entry, Button, StringVar, messagebox, Canvas, Scrollbar, Frame, Scale
+from tkinter import ttk, filedialog
 import os
+import threading
 import warnings
-
-# Suppress sklearn version warnings
-warnings.filterwarnings('ignore', category=UserWarning)
+from background_tasks import BackgroundRunner
+from instrumentation import action, stage
+import instrumentation
+# Theme, view titles and the figures shared with benchmark.py
+from figures import (BG_COLOR, CARD_BG, CARD_BORDER, ACCENT_CYAN, ACCENT_PURPLE, ACCENT_GREEN,
+                     ACCENT_RED, ACCENT_ORANGE, TEXT_COLOR, TEXT_MUTED, TEXT_BRIGHT,
+                     COMPARISON_TITLE, CONFUSION_TITLE, WEATHER_TITLE, new_figure,
+                     build_comparison_figure, build_confusion_figure, build_weather_figure)
+
+# The view titles carry emoji the default font may lack; matplotlib warns on
+# every draw. Only that warning is silenced (sklearn's are scoped in scoring)
+warnings.filterwarnings('ignore', message=r'Glyph \d+ .* missing from font', category=UserWarning)
 
 # Global flag for animation control
 animations_running = True
 
-# Load the model and dataset
 script_dir = os.path.dirname(os.path.abspath(__file__))
-model = joblib.load(os.path.join(script_dir, 'refined_disaster_prediction_model.pkl'))
-reference_data = pd.read_csv(os.path.join(script_dir, 'processed_disaster_data.csv'))
-
-# Check that the features from the model match the dataset
-expected_features = model.feature_names_in_
-print(f"Model Features: {expected_features}")
-print(f"Dataset Columns: {reference_data.columns}")
 
-# Ensure that the reference data has the correct features
-comparison = reference_data[expected_features].mean()
+# Features in the order the model was trained on; checked once it loads
+expected_features = ['temp', 'wspd', 'rhum', 'pres']
+
+# Filled in by the background loader
+model = None
+dataset = None
+comparison = None
+# Memoized predictions, bound to the model file
+prediction_cache = None
+# Calibrated risk and the held-out threshold table of the current model
+calibration = None
+# Alert when the calibrated risk reaches this value; set from the slider
+DEFAULT_ALERT_THRESHOLD = 0.5
+alert_threshold = DEFAULT_ALERT_THRESHOLD
+# (model label, calibrated risk) of the last prediction, re-judged when the
+# threshold moves
+last_prediction = None
+
+# Startup timing report, one (phase, seconds) entry per phase
+startup_phases = []
+
+def record_phase(name, start):
+    now = time.perf_counter()
+    startup_phases.append((name, now - start))
+    return now
 
 # Tkinter Setup - Futuristic Theme
 app = Tk()
@@ -40,20 +64,6 @@ logo_path = os.path.join(script_dir, 'logo.ico')
 if os.path.exists(logo_path):
     app.iconbitmap(logo_path)
 
-# Modern color scheme - Enhanced for better visibility
-BG_COLOR = "#0d1117"  # GitHub dark background
-CARD_BG = "#161b22"  # Lighter card background for contrast
-CARD_BORDER = "#30363d"  # Subtle border
-ACCENT_CYAN = "#58a6ff"  # Brighter cyan
-ACCENT_PURPLE = "#bc8cff"  # Brighter purple
-ACCENT_GREEN = "#3fb950"  # Brighter green
-ACCENT_RED = "#f85149"  # Brighter red
-ACCENT_ORANGE = "#ffa657"  # Brighter orange
-TEXT_COLOR = "#f0f6fc"  # Very light text for maximum visibility
-TEXT_MUTED = "#8b949e"  # Slightly lighter muted text
-TEXT_BRIGHT = "#ffffff"  # Pure white for important text
-
-
 # Canvas and Scrollbar Setup with modern styling
 canvas = Canvas(app, bg=BG_COLOR, highlightthickness=0)
 scrollbar = ttk.Scrollbar(app, orient="vertical", command=canvas.yview)
@@ -82,9 +92,10 @@ subtitle_label = Label(header_frame, text="AI-Powered Weather Disaster Analysis
 subtitle_label.pack(pady=(8, 0))
 
 # Status indicator with pulsing animation
-status_label = Label(header_frame, text="● SYSTEM ONLINE", 
-                    font=("", 10, "bold"), fg=ACCENT_GREEN, bg=BG_COLOR)
+status_label = Label(header_frame, text="● LOADING MODEL...", 
+                    font=("", 10, "bold"), fg=ACCENT_ORANGE, bg=BG_COLOR)
 status_label.pack(pady=(5, 0))
+status_colors = (ACCENT_ORANGE, "#d98843")  # Switches to green once online
 
 # Pulsing animation for title and status
 def pulse_animation():
@@ -97,7 +108,7 @@ def pulse_animation():
         title_label.config(fg=current_color)
         
         # Pulse the status indicator
-        status_color = ACCENT_GREEN if animation_index % 2 == 0 else "#2ea043"
+        status_color = status_colors[animation_index % 2]
         status_label.config(fg=status_color)
         
         animation_index += 1
@@ -147,14 +158,26 @@ inputs = {feature: StringVar() for feature in expected_features}
 current_graph_index = 0
 graph_widgets = []  # Store graph canvases
 graph_titles = []
+graph_views = {}  # Persistent figure/canvas per view, keyed by title
 carousel_container = None
 indicator_labels = []
 
+RISK_MAP_TITLE = "🗺️ Regional Risk Map"
+SENSITIVITY_TITLE = "🎛️ What-If Sensitivity"
+INTERACTION_TITLE = "🧭 What-If Interaction Map"
+
 # Function to Clear All Input Fields
 def clear_inputs():
     for feature in expected_features:
         inputs[feature].set("")
 
+# Function to check that the background loader has finished
+def check_ready():
+    if model is None:
+        messagebox.showinfo("Please Wait", "The prediction model is still loading.")
+        return False
+    return True
+
 # Function to check if all inputs are filled
 def check_inputs():
     missing_fields = [feature for feature in expected_features if not inputs[feature].get()]
@@ -163,33 +186,108 @@ def check_inputs():
         return False
     return True
 
+# Function to read the inputs as floats, reporting every bad or
+# physically impossible value at once
+def read_input_values():
+    from validation import describe, validate
+    checked = validate({feature: inputs[feature].get() for feature in expected_features}, expected_features)
+    if not checked.valid[0]:
+        messagebox.showerror("Input Error", "Invalid input:\n" + "\n".join(describe(checked, 0)))
+        return None
+    return [float(value) for value in checked.values[0]]
+
+# Function to report errors raised by background tasks
+def show_task_error(e):
+    messagebox.showerror("Error", f"An unexpected error occurred: {e}")
+
 # Function to Predict Disaster with improved error handling
 def predict_disaster():
-    if not check_inputs():
+    if not check_ready() or not check_inputs():
         return
+    input_values = read_input_values()
+    if input_values is None:
+        return
+    runner.submit("predict", traced("predict", run_prediction), show_prediction_result, show_task_error,
+                  input_values)
+
+# Function to time (and optionally profile) a background task when tracing is on
+def traced(name, func):
+    def run(task, *args):
+        with action(name):
+            return func(task, *args)
+    return run
+
+# Runs on a background worker
+def run_prediction(task, input_values):
+    from scoring import MODEL_PATH, disaster_probability
+    from calibration import get_calibration
+    cache = prediction_cache
+    prediction, probabilities = cache.predict(input_values)
+    probability = disaster_probability(cache.model, probabilities.reshape(1, -1))[0]
+    # Without a calibration (e.g. a held-out split with one class) the raw
+    # probability is shown, as on the risk map
     try:
-        input_data = pd.DataFrame([[float(inputs[feature].get() or "0") for feature in expected_features]], columns=expected_features)
-        prediction = model.predict(input_data)[0]
-        
-        # More detailed output based on prediction
-        if prediction == 1:
-            result_var.set("Disaster Prediction: A potential disaster is likely due to the conditions.")
-            messagebox.showwarning("Warning", "Potential disaster conditions detected! Immediate action may be necessary.")
-        else:
-            result_var.set("Disaster Prediction: No immediate disaster threat detected.")
-            messagebox.showinfo("Info", "Conditions are not likely to result in a disaster.")
-            
-    except ValueError as e:
-        messagebox.showerror("Input Error", f"Invalid input: {e}")
-    except Exception as e:
-        messagebox.showerror("Error", f"An unexpected error occurred: {e}")
-
-# Function to Clear Previous Plot before Creating a New One
+        fitted = get_calibration(cache.model, MODEL_PATH)
+    except (ValueError, OSError) as e:
+        print(f"Calibration unavailable: {e}")
+        return prediction, float(probability), None
+    return prediction, float(fitted.risk(probability)), fitted
+
+def show_prediction_result(result):
+    global calibration, last_prediction
+    prediction, risk, calibration = result
+    last_prediction = (prediction, risk)
+    alert = show_risk()
+    if calibration is None:
+        threshold_info_var.set("Held-out metrics unavailable; the risk score is the raw probability")
+    update_threshold_info()
+    # More detailed output based on prediction
+    if alert:
+        messagebox.showwarning("Warning", "Potential disaster conditions detected! Immediate action may be necessary.")
+    else:
+        messagebox.showinfo("Info", "Conditions are not likely to result in a disaster.")
+
+# Function to judge the last risk score against the alert threshold;
+# returns whether it raises an alert
+def show_risk():
+    if last_prediction is None:
+        return False
+    prediction, risk = last_prediction
+    alert = risk >= alert_threshold
+    if alert:
+        message = "Disaster Prediction: A potential disaster is likely due to the conditions."
+    else:
+        message = "Disaster Prediction: No immediate disaster threat detected."
+    result_var.set(f"{message}\nRisk score: {risk:.0%} (alert threshold {alert_threshold:.0%})")
+    return alert
+
+# Function to show the held-out precision and recall at the current threshold
+def update_threshold_info():
+    if calibration is None:
+        return
+    row = calibration.at(alert_threshold)
+    threshold_info_var.set(f"Precision {row['precision']:.0%} · Recall {row['recall']:.0%} · "
+                           f"False alarms {row['fpr']:.1%} (held-out data)")
+
+# Moving the slider is a table lookup: nothing is re-scored or re-evaluated
+def on_threshold_changed(value):
+    global alert_threshold
+    alert_threshold = float(value)
+    update_threshold_info()
+    show_risk()
+
+# Function to release a view's canvas widget and figure
+def release_view(view):
+    view['canvas'].get_tk_widget().destroy()
+    view['fig'].clear()
+
+# Function to Clear All Plots and release their figures
 def clear_previous_plot():
     global graph_widgets, carousel_container, indicator_labels
     # Clear all graph widgets
-    for widget in graph_widgets:
-        widget.destroy()
+    for view in graph_views.values():
+        release_view(view)
+    graph_views.clear()
     graph_widgets.clear()
     graph_titles.clear()
     
@@ -256,8 +354,9 @@ def prev_graph():
         current_graph_index = (current_graph_index - 1) % len(graph_widgets)
         show_graph_in_carousel(current_graph_index)
 
-# Function to add graph to carousel
-def add_graph_to_carousel(fig, title):
+# Function to add graph to carousel, or replace the figure of an existing
+# view in place; each view keeps one figure and canvas for its lifetime
+def add_graph_to_carousel(fig, title, key=None, state=None):
     global graph_widgets, carousel_container
     
     if not carousel_container:
@@ -271,21 +370,24 @@ def add_graph_to_carousel(fig, title):
               fg=ACCENT_CYAN, bg=BG_COLOR).pack()
     
     # Create canvas for this graph
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
     canvas_widget = FigureCanvasTkAgg(fig, master=carousel_container)
-    canvas_widget.draw()
-    graph_widgets.append(canvas_widget.get_tk_widget())
-    graph_titles.append(title)
-    
-    # Show the first graph
-    if len(graph_widgets) == 1:
-        canvas_widget.get_tk_widget().grid(row=1, column=0, pady=10)
-    
-    # Update navigation controls
+    view = {'fig': fig, 'canvas': canvas_widget, 'key': key, 'state': state or {}}
+    if title in graph_views:
+        release_view(graph_views[title])
+        graph_widgets[graph_titles.index(title)] = canvas_widget.get_tk_widget()
+    else:
+        graph_widgets.append(canvas_widget.get_tk_widget())
+        graph_titles.append(title)
+    graph_views[title] = view
+    if 'input_bars' in view['state']:
+        enable_input_blitting(view)
+    with stage("canvas draw"):
+        canvas_widget.draw()
+    
+    # Update navigation controls and show the graph
     update_carousel_controls()
-    
-    # Force scroll region update
-    scrollable_frame.update_idletasks()
-    canvas.config(scrollregion=canvas.bbox("all"))
+    show_graph_in_carousel(graph_titles.index(title))
     
     # Scroll to show the new content
     canvas.yview_moveto(0)
@@ -332,134 +434,264 @@ def update_carousel_controls():
         indicator.bind("<Button-1>", lambda e, idx=i: show_graph_in_carousel(idx))
         indicator_labels.append(indicator)
     
-    # Set first indicator as active
-    if indicator_labels:
-        indicator_labels[0].config(fg=ACCENT_CYAN, text="●")
+    # Set current indicator as active
+    if 0 <= current_graph_index < len(indicator_labels):
+        indicator_labels[current_graph_index].config(fg=ACCENT_CYAN, text="●")
     
     scrollable_frame.update_idletasks()
     canvas.config(scrollregion=canvas.bbox("all"))
 
+# Function to show a view built in the background; builders return None
+# when the view's current figure is still up to date
+def display_view(title, result):
+    if result is None:
+        show_graph_in_carousel(graph_titles.index(title))
+        return
+    fig, key, state = result
+    add_graph_to_carousel(fig, title, key, state)
+
+# Key of the data currently drawn in a view
+def view_key(title):
+    view = graph_views.get(title)
+    return view['key'] if view else None
+
+# Function to blit the input bars over a cached background after every full draw
+def enable_input_blitting(view):
+    state = view['state']
+    
+    def on_draw(event):
+        state['background'] = view['canvas'].copy_from_bbox(view['fig'].bbox)
+        for bar in state['input_bars']:
+            state['ax'].draw_artist(bar)
+    
+    view['canvas'].mpl_connect('draw_event', on_draw)
+
+# Function to update the comparison bars in place instead of rebuilding
+def update_comparison_view(view, input_values):
+    state = view['state']
+    ax = state['ax']
+    for bar, value in zip(state['input_bars'], input_values):
+        bar.set_height(value)
+    
+    low, high = ax.get_ylim()
+    values = list(comparison.values) + list(input_values) + [0]
+    if 'background' not in state or min(values) < low or max(values) > high:
+        # Bars left the axes: rescale and redraw the figure once
+        ax.relim()
+        ax.autoscale_view()
+        view['canvas'].draw_idle()
+    else:
+        with stage("canvas blit"):
+            view['canvas'].restore_region(state['background'])
+            for bar in state['input_bars']:
+                ax.draw_artist(bar)
+            view['canvas'].blit(ax.bbox)
+
 # Function to Show Comparison Plot
 def show_comparison_plot():
-    if not check_inputs():
+    if not check_ready() or not check_inputs():
         return
-    
-    clear_previous_plot()
-    input_values = [float(inputs[feature].get() or "0") for feature in expected_features]
-    
-    # Modern dark theme for plot
-    plt.style.use('dark_background')
-    fig, ax = plt.subplots(figsize=(10, 6), facecolor='#1a1f3a')
-    ax.set_facecolor('#1a1f3a')
-    
-    x = range(len(expected_features))
-    width = 0.35
-    
-    bars1 = ax.bar([i - width/2 for i in x], comparison.values, width, 
-                    color=ACCENT_CYAN, label="Dataset Average", alpha=0.8)
-    bars2 = ax.bar([i + width/2 for i in x], input_values, width, 
-                    color=ACCENT_ORANGE, label="Your Input", alpha=0.8)
-    
-    ax.set_xlabel("Weather Parameters", fontsize=12, fontweight="bold", color=TEXT_COLOR)
-    ax.set_ylabel("Value", fontsize=12, fontweight="bold", color=TEXT_COLOR)
-    ax.set_title("📊 Input Comparison Analysis", fontsize=16, fontweight="bold", 
-                 color=ACCENT_CYAN, pad=20)
-    ax.set_xticks(x)
-    ax.set_xticklabels(expected_features, color=TEXT_COLOR)
-    ax.tick_params(colors=TEXT_COLOR)
-    ax.legend(facecolor='#2a2f4a', edgecolor=ACCENT_CYAN, labelcolor=TEXT_COLOR)
-    ax.grid(True, alpha=0.2, color=TEXT_MUTED, linestyle='--')
-    
-    plt.tight_layout()
-    add_graph_to_carousel(fig, "📊 Input Comparison Analysis")
+    input_values = read_input_values()
+    if input_values is None:
+        return
+    view = graph_views.get(COMPARISON_TITLE)
+    if view is not None:
+        update_comparison_view(view, input_values)
+        show_graph_in_carousel(graph_titles.index(COMPARISON_TITLE))
+        return
+    runner.submit(COMPARISON_TITLE, traced("comparison figure", build_comparison_figure),
+                  lambda result: display_view(COMPARISON_TITLE, result),
+                  show_task_error, comparison, input_values)
 
 # Function to Show Confusion Matrix
 def show_confusion_matrix():
-    clear_previous_plot()
-    data = pd.read_csv(os.path.join(script_dir, 'processed_disaster_data.csv'))
-    features = expected_features
-    target = 'disaster'
-    X = data[features]
-    y = data[target]
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-    y_pred = model.predict(X_test)
-    cm = confusion_matrix(y_test, y_pred)
-    
-    # Futuristic styling
-    plt.style.use('dark_background')
-    fig, ax = plt.subplots(figsize=(8, 7), facecolor='#1a1f3a')
-    ax.set_facecolor('#1a1f3a')
-    
-    disp = ConfusionMatrixDisplay(cm, display_labels=['No Disaster', 'Disaster'])
-    disp.plot(cmap='viridis', ax=ax, colorbar=True, values_format='d')
-    ax.set_title("🔮 Model Performance Matrix", fontsize=16, fontweight="bold", 
-                 color=ACCENT_PURPLE, pad=20)
-    ax.set_xlabel("Predicted Label", fontsize=12, color=TEXT_COLOR, fontweight="bold")
-    ax.set_ylabel("True Label", fontsize=12, color=TEXT_COLOR, fontweight="bold")
-    ax.tick_params(colors=TEXT_COLOR)
-    
-    plt.tight_layout()
-    add_graph_to_carousel(fig, "🔮 Model Performance Matrix")
+    if not check_ready():
+        return
+    runner.submit(CONFUSION_TITLE, traced("confusion figure", build_confusion_figure),
+                  lambda result: display_view(CONFUSION_TITLE, result),
+                  show_task_error, model, view_key(CONFUSION_TITLE))
 
 # Function to Show Weather Data Graphs
 def show_weather_graphs():
-    clear_previous_plot()
-    data = pd.read_csv(os.path.join(script_dir, 'processed_disaster_data.csv'))
-    data['time'] = pd.to_datetime(data['time'])
-    
-    # Futuristic dark theme
-    plt.style.use('dark_background')
-    fig, ax = plt.subplots(2, 2, figsize=(14, 10), facecolor='#1a1f3a')
-    
-    # Temperature plot
-    ax[0, 0].set_facecolor('#1a1f3a')
-    ax[0, 0].plot(data['time'], data['temp'], label='Temperature (°C)', 
-                  color=ACCENT_RED, linewidth=2, alpha=0.9)
-    ax[0, 0].fill_between(data['time'], data['temp'], alpha=0.2, color=ACCENT_RED)
-    ax[0, 0].set_title('🌡️ Temperature Trends', fontsize=13, fontweight="bold", 
-                       color=ACCENT_RED, pad=10)
-    ax[0, 0].grid(True, alpha=0.2, color=TEXT_MUTED, linestyle='--')
-    ax[0, 0].legend(facecolor='#2a2f4a', edgecolor=ACCENT_RED, labelcolor=TEXT_COLOR)
-    ax[0, 0].tick_params(colors=TEXT_COLOR)
-    
-    # Wind Speed plot
-    ax[0, 1].set_facecolor('#1a1f3a')
-    ax[0, 1].plot(data['time'], data['wspd'], label='Wind Speed (m/s)', 
-                  color=ACCENT_CYAN, linewidth=2, alpha=0.9)
-    ax[0, 1].fill_between(data['time'], data['wspd'], alpha=0.2, color=ACCENT_CYAN)
-    ax[0, 1].set_title('💨 Wind Speed Patterns', fontsize=13, fontweight="bold", 
-                       color=ACCENT_CYAN, pad=10)
-    ax[0, 1].grid(True, alpha=0.2, color=TEXT_MUTED, linestyle='--')
-    ax[0, 1].legend(facecolor='#2a2f4a', edgecolor=ACCENT_CYAN, labelcolor=TEXT_COLOR)
-    ax[0, 1].tick_params(colors=TEXT_COLOR)
-    
-    # Humidity plot
-    ax[1, 0].set_facecolor('#1a1f3a')
-    ax[1, 0].plot(data['time'], data['rhum'], label='Humidity (%)', 
-                  color=ACCENT_GREEN, linewidth=2, alpha=0.9)
-    ax[1, 0].fill_between(data['time'], data['rhum'], alpha=0.2, color=ACCENT_GREEN)
-    ax[1, 0].set_title('💧 Humidity Levels', fontsize=13, fontweight="bold", 
-                       color=ACCENT_GREEN, pad=10)
-    ax[1, 0].grid(True, alpha=0.2, color=TEXT_MUTED, linestyle='--')
-    ax[1, 0].legend(facecolor='#2a2f4a', edgecolor=ACCENT_GREEN, labelcolor=TEXT_COLOR)
-    ax[1, 0].tick_params(colors=TEXT_COLOR)
-    
-    # Pressure plot
-    ax[1, 1].set_facecolor('#1a1f3a')
-    ax[1, 1].plot(data['time'], data['pres'], label='Pressure (hPa)', 
-                  color=ACCENT_PURPLE, linewidth=2, alpha=0.9)
-    ax[1, 1].fill_between(data['time'], data['pres'], alpha=0.2, color=ACCENT_PURPLE)
-    ax[1, 1].set_title('📊 Atmospheric Pressure', fontsize=13, fontweight="bold", 
-                       color=ACCENT_PURPLE, pad=10)
-    ax[1, 1].grid(True, alpha=0.2, color=TEXT_MUTED, linestyle='--')
-    ax[1, 1].legend(facecolor='#2a2f4a', edgecolor=ACCENT_PURPLE, labelcolor=TEXT_COLOR)
-    ax[1, 1].tick_params(colors=TEXT_COLOR)
-    
-    fig.suptitle('📈 Weather Data Analysis Dashboard', fontsize=16, fontweight="bold", 
-                 color=TEXT_COLOR, y=0.995)
-    
-    plt.tight_layout()
-    add_graph_to_carousel(fig, "📈 Weather Data Analysis Dashboard")
+    if not check_ready():
+        return
+    runner.submit(WEATHER_TITLE, traced("weather figure", build_weather_figure),
+                  lambda result: display_view(WEATHER_TITLE, result),
+                  show_task_error, view_key(WEATHER_TITLE))
+
+# Function to Show a Risk Map of gridded forecast fields
+def show_risk_map():
+    if not check_ready():
+        return
+    path = filedialog.askopenfilename(
+        title="Open forecast fields",
+        filetypes=[("Forecast fields", "*.npz *.npy"), ("All files", "*.*")])
+    if not path:
+        return
+    # Picking one <feature>.npy opens the directory of per-feature fields
+    if os.path.splitext(os.path.basename(path))[0] in expected_features:
+        path = os.path.dirname(path)
+    runner.submit(RISK_MAP_TITLE, traced("risk map figure", build_risk_map_figure),
+                  lambda result: display_view(RISK_MAP_TITLE, result),
+                  show_task_error, path, view_key(RISK_MAP_TITLE))
+
+def build_risk_map_figure(task, path, current_key):
+    from grid_scoring import draw_heatmap, load_fields, peak_risk, score_grid
+    fields = load_fields(path, expected_features)
+    # Rebuild only for new fields, a new model or a change of calibration
+    sources = [os.path.join(path, feature + '.npy') for feature in expected_features] if os.path.isdir(path) else [path]
+    current_model = get_batch_model()
+    key = (path, tuple(os.stat(source).st_mtime_ns for source in sources), id(current_model),
+           calibration is not None)
+    if key == current_key:
+        return None
+    
+    # The whole grid goes through the model tile by tile; tiles are large
+    # enough that sklearn's compiled walk beats the flattened forest
+    risk = calibration.risk if calibration is not None else None
+    raster, report = score_grid(current_model, fields, risk=risk, on_tile=task.checkpoint)
+    peak = peak_risk(raster)
+    task.checkpoint()
+    
+    fig = new_figure(figsize=(10, 8), facecolor='#1a1f3a')
+    ax = fig.subplots()
+    ax.set_facecolor('#1a1f3a')
+    image = draw_heatmap(ax, peak)
+    label = "Calibrated risk" if risk is not None else "Disaster probability"
+    colorbar = fig.colorbar(image, ax=ax)
+    colorbar.set_label(label, color=TEXT_COLOR, fontsize=11)
+    colorbar.ax.tick_params(colors=TEXT_COLOR)
+    
+    timesteps = f", peak over {raster.shape[0]} timesteps" if raster.ndim == 3 else ""
+    ax.set_title(f"{RISK_MAP_TITLE}\n{os.path.basename(path)}{timesteps}", fontsize=16, fontweight="bold",
+                 color=ACCENT_ORANGE, pad=20)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        alerting = float((peak >= alert_threshold).sum()) / max(int((peak == peak).sum()), 1)
+    ax.set_xlabel(f"x (cells) · {report.cells:,} cells scored in {report.seconds:.1f}s · "
+                  f"{alerting:.1%} at or above the {alert_threshold:.0%} alert threshold",
+                  fontsize=11, color=TEXT_COLOR)
+    ax.set_ylabel("y (cells)", fontsize=11, color=TEXT_COLOR)
+    ax.tick_params(colors=TEXT_COLOR)
+    
+    task.checkpoint()
+    with stage("layout"):
+        fig.tight_layout()
+    return fig, key, {}
+
+# The sklearn forest of the current model, for the views that score large
+# grids. An app started from the compact export loads the pickle on first
+# use; if a newer pickle was published meanwhile, the export keeps serving
+# until the reload swaps both.
+batch_model = None
+batch_model_lock = threading.Lock()
+
+def get_batch_model():
+    global batch_model
+    with batch_model_lock:
+        current = model
+        if hasattr(current, 'estimators_'):
+            return current
+        if batch_model is None or batch_model[0] is not current:
+            from scoring import MODEL_PATH, load_model, model_hash
+            loaded = load_model(MODEL_PATH)
+            batch_model = (current, loaded if model_hash(loaded) == model_hash(current) else current)
+        return batch_model[1]
+
+# Sweep engine of the current model, created on first use by a worker
+sensitivity_engine = None
+sensitivity_lock = threading.Lock()
+
+def get_sensitivity_engine():
+    global sensitivity_engine
+    with sensitivity_lock:
+        current = get_batch_model()
+        if sensitivity_engine is None or sensitivity_engine.model is not current:
+            from sensitivity import SensitivityEngine, dataset_spans
+            sensitivity_engine = SensitivityEngine(current, dataset_spans(dataset, expected_features))
+        return sensitivity_engine
+
+# Function to Show how the risk responds to every input moving across its range
+def show_sensitivity():
+    if not check_ready() or not check_inputs():
+        return
+    input_values = read_input_values()
+    if input_values is None:
+        return
+    # Both views read the same sweep; whichever runs second gets it from the cache
+    runner.submit(INTERACTION_TITLE, traced("interaction figure", build_interaction_figure),
+                  lambda result: display_view(INTERACTION_TITLE, result),
+                  show_task_error, input_values, view_key(INTERACTION_TITLE))
+    runner.submit(SENSITIVITY_TITLE, traced("sensitivity figure", build_sensitivity_figure),
+                  lambda result: display_view(SENSITIVITY_TITLE, result),
+                  show_task_error, input_values, view_key(SENSITIVITY_TITLE))
+
+# Sweep of the inputs and its values as shown: calibrated risk when available
+def sweep_values(input_values):
+    engine = get_sensitivity_engine()
+    sweep = engine.sweep(input_values)
+    if calibration is not None:
+        return engine, sweep, calibration.risk(sweep.risk), "Calibrated risk"
+    return engine, sweep, sweep.risk, "Disaster probability"
+
+def build_sensitivity_figure(task, input_values, current_key):
+    from sensitivity import center_slice, partial_dependence
+    engine = get_sensitivity_engine()
+    key = (engine.key(input_values), id(engine.model), calibration is not None, alert_threshold)
+    if key == current_key:
+        return None
+    engine, sweep, values, label = sweep_values(input_values)
+    task.checkpoint()
+    
+    fig = new_figure(figsize=(12, 9), facecolor='#1a1f3a')
+    ax = fig.subplots(2, 2)
+    curves = zip(ax.ravel(), expected_features, label_texts, colors, sweep.axes,
+                 partial_dependence(sweep, values), center_slice(sweep, values), sweep.center)
+    for a, feature, text, color, axis, mean, line, value in curves:
+        a.set_facecolor('#1a1f3a')
+        a.plot(axis, line, color=color, linewidth=2.5, label="Others at your input")
+        a.plot(axis, mean, color=TEXT_COLOR, linewidth=1.5, linestyle='--', label="Averaged over others")
+        a.axvline(value, color=ACCENT_ORANGE, linestyle=':', linewidth=1.5, label="Your input")
+        a.axhline(alert_threshold, color=ACCENT_RED, alpha=0.6, linewidth=1, label="Alert threshold")
+        a.set_ylim(-0.02, 1.02)
+        a.set_title(text, fontsize=13, fontweight="bold", color=color, pad=10)
+        a.set_ylabel(label, color=TEXT_COLOR)
+        a.grid(True, alpha=0.2, color=TEXT_MUTED, linestyle='--')
+        a.tick_params(colors=TEXT_COLOR)
+    ax[0, 0].legend(facecolor='#2a2f4a', edgecolor=ACCENT_CYAN, labelcolor=TEXT_COLOR, fontsize=9)
+    fig.suptitle(f"{SENSITIVITY_TITLE}\n{sweep.risk.size:,} what-if points scored in {sweep.seconds:.2f}s",
+                 fontsize=16, fontweight="bold", color=TEXT_COLOR, y=0.995)
+    
+    task.checkpoint()
+    with stage("layout"):
+        fig.tight_layout()
+    return fig, key, {}
+
+def build_interaction_figure(task, input_values, current_key):
+    from sensitivity import feature_pairs, pair_map
+    engine = get_sensitivity_engine()
+    key = (engine.key(input_values), id(engine.model), calibration is not None)
+    if key == current_key:
+        return None
+    engine, sweep, values, label = sweep_values(input_values)
+    task.checkpoint()
+    
+    fig = new_figure(figsize=(14, 9), facecolor='#1a1f3a')
+    ax = fig.subplots(2, 3)
+    for a, (i, j) in zip(ax.ravel(), feature_pairs(expected_features)):
+        # Rows follow feature i, columns feature j
+        x, y = sweep.axes[j], sweep.axes[i]
+        image = a.imshow(pair_map(sweep, i, j, values), cmap='inferno', vmin=0.0, vmax=1.0, origin='lower',
+                         aspect='auto', interpolation='nearest', extent=(x[0], x[-1], y[0], y[-1]))
+        a.plot(sweep.center[j], sweep.center[i], marker='x', color=TEXT_BRIGHT, markersize=10, mew=2)
+        a.set_xlabel(label_texts[j], color=TEXT_COLOR)
+        a.set_ylabel(label_texts[i], color=TEXT_COLOR)
+        a.tick_params(colors=TEXT_COLOR)
+    colorbar = fig.colorbar(image, ax=ax.ravel().tolist())
+    colorbar.set_label(f"{label}, averaged over the other inputs", color=TEXT_COLOR)
+    colorbar.ax.tick_params(colors=TEXT_COLOR)
+    fig.suptitle(INTERACTION_TITLE, fontsize=16, fontweight="bold", color=ACCENT_CYAN)
+    return fig, key, {}
 
 # Create Input Fields with Futuristic Card Design - CENTERED
 label_texts = ["Temperature (°C)", "Wind Speed (km/hr)", "Humidity (%)", "Pressure (hPa)"]
@@ -515,6 +747,21 @@ result_label = Label(result_inner, textvariable=result_var, font=("", 15, "bold"
                      fg=TEXT_BRIGHT, bg=CARD_BG, wraplength=700, justify="center")  # Brighter result text
 result_label.pack(fill="x")
 
+# Alert threshold on the calibrated risk score
+threshold_frame = Frame(result_inner, bg=CARD_BG)
+threshold_frame.pack(fill="x", pady=(15, 0))
+Label(threshold_frame, text="🎚️ Alert threshold", font=("", 10, "bold"),
+      fg=TEXT_COLOR, bg=CARD_BG).pack(side="left")
+threshold_scale = Scale(threshold_frame, from_=0.05, to=0.95, resolution=0.01, orient="horizontal",
+                        length=220, showvalue=True, command=on_threshold_changed,
+                        bg=CARD_BG, fg=TEXT_COLOR, troughcolor="#0d1117",
+                        activebackground=ACCENT_GREEN, highlightthickness=0, bd=0)
+threshold_scale.set(DEFAULT_ALERT_THRESHOLD)
+threshold_scale.pack(side="left", padx=10)
+threshold_info_var = StringVar(value="Held-out metrics appear once the model is loaded")
+Label(threshold_frame, textvariable=threshold_info_var, font=("", 10),
+      fg=TEXT_MUTED, bg=CARD_BG).pack(side="left")
+
 # Futuristic Button Panel - CENTERED
 button_frame = Frame(scrollable_frame, bg=BG_COLOR)
 button_frame.grid(row=4, column=0, pady=(20, 30))
@@ -525,17 +772,21 @@ buttons_config = [
     ("📊 Show Comparison", show_comparison_plot, ACCENT_CYAN, "#4a8ad9"),
     ("🔮 Confusion Matrix", show_confusion_matrix, ACCENT_PURPLE, "#9b73d9"),
     ("📈 Show Graphs", show_weather_graphs, ACCENT_GREEN, "#32933f"),
+    ("🗺️ Risk Map", show_risk_map, "#f778ba", "#d35f9b"),
+    ("🎛️ What-If", show_sensitivity, "#39c5cf", "#2d9ea6"),
     ("🗑️ Clear All", clear_inputs, ACCENT_ORANGE, "#d98843")
 ]
 
 button_widgets = []  # Store button references for animation
+BUTTONS_PER_ROW = 4
+button_rows = (len(buttons_config) + BUTTONS_PER_ROW - 1) // BUTTONS_PER_ROW
 
 for i, (text, cmd, bg, active_bg) in enumerate(buttons_config):
     btn = Button(button_frame, text=text, font=("", 11, "bold"), command=cmd, 
                  bg=bg, fg=TEXT_BRIGHT, activebackground=active_bg, 
                  activeforeground=TEXT_BRIGHT, relief="flat", bd=0,
                  padx=22, pady=14, cursor="hand2")
-    btn.grid(row=0, column=i, padx=10, pady=5)
+    btn.grid(row=i // BUTTONS_PER_ROW, column=i % BUTTONS_PER_ROW, padx=10, pady=5)
     button_widgets.append((btn, bg, active_bg))
     
     # Hover effect simulation using enter/leave events
@@ -548,6 +799,145 @@ for i, (text, cmd, bg, active_bg) in enumerate(buttons_config):
     btn.bind("<Enter>", on_enter)
     btn.bind("<Leave>", on_leave)
 
+# Progress indicator shown while background work is running
+progress_frame = Frame(button_frame, bg=BG_COLOR)
+progress_frame.grid(row=button_rows, column=0, columnspan=BUTTONS_PER_ROW, pady=(10, 0))
+Label(progress_frame, text="⏳ Working...", font=("", 10, "bold"),
+      fg=TEXT_MUTED, bg=BG_COLOR).pack(side="left", padx=(0, 10))
+progress_bar = ttk.Progressbar(progress_frame, mode="indeterminate", length=300)
+progress_bar.pack(side="left")
+progress_frame.grid_remove()
+
+def set_busy(busy):
+    if busy:
+        progress_frame.grid()
+        progress_bar.start(15)
+    else:
+        progress_bar.stop()
+        progress_frame.grid_remove()
+
+# Background worker for prediction, data loading and figure building
+runner = BackgroundRunner(app, on_busy=set_busy)
+
+# Runs on a background worker once the first frame is on screen
+def load_resources(task):
+    global model_signature
+    start = time.perf_counter()
+    from scoring import MODEL_PATH, DATA_PATH, load_model
+    start = record_phase("imports", start)
+    # Taken before loading, so a model published meanwhile is picked up later
+    model_signature = model_file_signature()
+    loaded_model = load_model(current_model_path())
+    from prediction_cache import PredictionCache
+    loaded_cache = PredictionCache(loaded_model)
+    start = record_phase("model load", start)
+    from dataset_store import get_store
+    loaded_dataset = get_store(DATA_PATH)
+    loaded_comparison = loaded_dataset.comparison(expected_features)
+    record_phase("dataset load", start)
+    return loaded_model, loaded_cache, loaded_dataset, loaded_comparison
+
+# The compact export when it was exported from the current model file, since
+# it loads without unpickling or importing sklearn; otherwise the pickle
+def current_model_path():
+    import model_format
+    from scoring import MODEL_PATH
+    return model_format.current_for(MODEL_PATH) or MODEL_PATH
+
+def on_resources_loaded(result):
+    global model, prediction_cache, dataset, comparison, status_colors
+    loaded_model, loaded_cache, dataset, comparison = result
+    
+    # Check that the features from the model match the dataset
+    print(f"Model Features: {loaded_model.feature_names_in_}")
+    print(f"Dataset Columns: {dataset.frame.columns}")
+    if list(loaded_model.feature_names_in_) != expected_features:
+        on_resources_failed(ValueError(f"Model features {list(loaded_model.feature_names_in_)} "
+                                       f"do not match the input fields {expected_features}"))
+        return
+    model = loaded_model
+    prediction_cache = loaded_cache
+    
+    status_label.config(text="● SYSTEM ONLINE")
+    status_colors = (ACCENT_GREEN, "#2ea043")
+    print("Startup: " + " | ".join(f"{name} {seconds:.2f}s" for name, seconds in startup_phases)
+          + f" | ready after {time.perf_counter() - startup_clock:.2f}s")
+    app.after(MODEL_WATCH_MS, watch_model_file)
+    submit_calibration()
+
+def on_resources_failed(e):
+    global status_colors
+    status_label.config(text="● MODEL UNAVAILABLE")
+    status_colors = (ACCENT_RED, "#cc3d3d")
+    messagebox.showerror("Startup Error", f"Could not load the model or dataset: {e}")
+
+# How often the model file is checked for a newly published version
+MODEL_WATCH_MS = 2000
+model_signature = None
+
+def model_file_signature():
+    from scoring import MODEL_PATH
+    try:
+        stat = os.stat(MODEL_PATH)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+# Function to reload the model when training.py publishes a new one
+def watch_model_file():
+    global model_signature
+    if not animations_running:
+        return
+    signature = model_file_signature()
+    if signature is not None and signature != model_signature:
+        model_signature = signature
+        runner.submit("reload", reload_model, on_model_reloaded, on_reload_failed)
+    app.after(MODEL_WATCH_MS, watch_model_file)
+
+# Runs on a background worker
+def reload_model(task):
+    from scoring import load_model
+    from prediction_cache import PredictionCache
+    new_model = load_model(current_model_path())
+    return new_model, PredictionCache(new_model)
+
+# The old model keeps serving until the new one is fully loaded
+def on_model_reloaded(result):
+    global model, prediction_cache
+    new_model, new_cache = result
+    if list(new_model.feature_names_in_) != expected_features:
+        on_reload_failed(ValueError(f"Model features {list(new_model.feature_names_in_)} "
+                                    f"do not match the input fields {expected_features}"))
+        return
+    model, prediction_cache = new_model, new_cache
+    print(f"Model reloaded: {new_model.n_estimators} trees")
+    submit_calibration()
+
+def on_reload_failed(e):
+    print(f"Model reload failed, keeping the current model: {e}")
+
+# Function to fit or load the threshold table of the current model in the
+# background, so the slider shows held-out metrics before the first prediction
+def submit_calibration():
+    runner.submit("calibration", traced("calibration", load_calibration), on_calibration_loaded,
+                  lambda e: print(f"Calibration unavailable: {e}"), model)
+
+# Runs on a background worker
+def load_calibration(task, current_model):
+    from scoring import MODEL_PATH
+    from calibration import get_calibration
+    return get_calibration(current_model, MODEL_PATH)
+
+def on_calibration_loaded(result):
+    global calibration
+    calibration = result
+    update_threshold_info()
+
+# Called once the main loop has painted the window
+def on_first_frame():
+    record_phase("first frame", window_built)
+    runner.submit("startup", traced("startup", load_resources), on_resources_loaded, on_resources_failed)
+
 # Button glow animation
 def button_glow_animation():
     global animations_running
@@ -574,11 +964,18 @@ app.after(2000, button_glow_animation)
 # Update Scroll Region
 scrollable_frame.update_idletasks()
 canvas.config(scrollregion=canvas.bbox("all"))
+window_built = record_phase("window built", startup_clock)
+app.after(1, on_first_frame)
 
 # Window close handler to stop animations gracefully
 def on_closing():
     global animations_running
     animations_running = False
+    runner.shutdown()
+    clear_previous_plot()
+    if instrumentation.enabled():
+        print(instrumentation.format_table())
+        instrumentation.export(os.path.join(script_dir, '.cache', f'trace-{os.getpid()}.json'))
     app.after(100, app.destroy)  # Give animations time to stop
 
 app.protocol("WM_DELETE_WINDOW", on_closing)
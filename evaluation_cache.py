@@ -0,0 +1,112 @@
+# Cached evaluation of the model on its held-out split.
+#
+# The stratified train/test split, the test-set predictions, the confusion
+# matrix and the derived metrics are computed once and persisted under
+# .cache/. Entries are keyed on the hash of the file the model was loaded
+# from (scoring.model_hash, taken as the file was read, never re-read at
+# lookup) plus the dataset's mtime and size. A newly published model or
+# dataset gets its own entry, a model loaded before the publish keeps its
+# own results, and repeated views are served from memory.
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from dataset_store import get_store
+from instrumentation import stage
+from scoring import DATA_PATH, model_hash, script_dir
+
+CACHE_DIR = os.path.join(script_dir, '.cache')
+
+# Split parameters used by the confusion-matrix view
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+TARGET = 'disaster'
+
+Evaluation = namedtuple('Evaluation', ['train_index', 'test_index', 'y_test', 'y_pred', 'confusion', 'metrics'])
+
+_hashes = {}
+_evaluations = {}
+
+
+# SHA-256 of a file, memoised on its mtime and size
+def file_hash(path):
+    stat = os.stat(path)
+    signature = (path, stat.st_mtime_ns, stat.st_size)
+    if signature not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        _hashes[signature] = digest.hexdigest()
+    return _hashes[signature]
+
+
+def cache_key(model, data_path=DATA_PATH):
+    stat = os.stat(data_path)
+    return f"{model_hash(model)}-{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def compute_evaluation(model, data_path=DATA_PATH):
+    from sklearn.metrics import accuracy_score, confusion_matrix, f1_score, precision_score, recall_score
+    from sklearn.model_selection import train_test_split
+
+    data = get_store(data_path).frame
+    X = data[list(model.feature_names_in_)]
+    y = data[TARGET].to_numpy()
+    train_index, test_index = train_test_split(np.arange(len(data)), test_size=TEST_SIZE,
+                                               random_state=RANDOM_STATE, stratify=y)
+    y_test = y[test_index]
+    y_pred = model.predict(X.iloc[test_index])
+    metrics = {
+        'accuracy': float(accuracy_score(y_test, y_pred)),
+        'precision': float(precision_score(y_test, y_pred, zero_division=0)),
+        'recall': float(recall_score(y_test, y_pred, zero_division=0)),
+        'f1': float(f1_score(y_test, y_pred, zero_division=0)),
+    }
+    return Evaluation(train_index, test_index, y_test, y_pred, confusion_matrix(y_test, y_pred), metrics)
+
+
+def _cache_path(cache_dir):
+    return os.path.join(cache_dir, 'evaluation.npz')
+
+
+def _load(path, key):
+    try:
+        with np.load(path, allow_pickle=False) as stored:
+            if str(stored['key']) != key:
+                return None
+            return Evaluation(stored['train_index'], stored['test_index'], stored['y_test'],
+                              stored['y_pred'], stored['confusion'], json.loads(str(stored['metrics'])))
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _save(path, key, evaluation):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, key=np.array(key), train_index=evaluation.train_index,
+             test_index=evaluation.test_index, y_test=evaluation.y_test, y_pred=evaluation.y_pred,
+             confusion=evaluation.confusion, metrics=np.array(json.dumps(evaluation.metrics)))
+    os.replace(tmp_path, path)
+
+
+# Evaluation of the model on the held-out split, from memory, disk or fresh
+def evaluate(model, data_path=DATA_PATH, cache_dir=CACHE_DIR):
+    key = cache_key(model, data_path)
+    if key in _evaluations:
+        return _evaluations[key]
+    path = _cache_path(cache_dir)
+    evaluation = _load(path, key)
+    if evaluation is None:
+        with stage("evaluation"):
+            evaluation = compute_evaluation(model, data_path)
+        try:
+            _save(path, key, evaluation)
+        except OSError:
+            pass  # Read-only install: keep the in-memory copy only
+    _evaluations.clear()
+    _evaluations[key] = evaluation
+    return evaluation
@@ -0,0 +1,260 @@
+# Flattened inference engine for the fitted RandomForestClassifier.
+#
+# The trees are compiled into flat, contiguous NumPy node arrays - feature,
+# threshold, left child, right child and class probabilities - concatenated
+# across the forest, with each tree's root recorded. A batch is scored
+# against all trees at once by walking every (tree, row) pair down one level
+# per step:
+#
+#   node = np.where(X[row, feature[node]] <= threshold[node], left[node], right[node])
+#
+# Pairs that reach a leaf are set aside as they accumulate, so later steps
+# only touch the pairs still on an internal node. The arrays grow linearly
+# with the number of nodes, so any forest can be flattened however deep its
+# trees are.
+#
+# This replaces sklearn's per-estimator dispatch and DataFrame feature-name
+# checks with a few gathers over all trees at once, which makes single rows
+# and small batches several times faster; on large batches sklearn's
+# compiled walk wins. Rows are compared as float32 like sklearn does, and the
+# probabilities are normalised and accumulated in the same order and
+# precision as RandomForestClassifier.predict_proba, so they match it bit
+# for bit. The engine is therefore only offered where batches stay small
+# (prediction_service.py --fast); the batch tools score with sklearn.
+#
+#   python fast_forest.py --rows 1 1000 100000
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+# Rows walked per block; keeps the (trees x rows) work arrays in cache
+BLOCK_ROWS = 1024
+
+# Child index of a leaf, as in sklearn's tree arrays
+LEAF = -1
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, roots, classes, feature_names):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        # Class probabilities of every node, normalised per tree like sklearn
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names
+
+        # Derived walk tables. Internal nodes are renumbered ahead of the
+        # leaves, so "reached a leaf" is one comparison, and every id is
+        # doubled, so the child taken is ``children[id + went_right]``.
+        # Leaves point at themselves. A float32 row value is <= a float64
+        # threshold exactly when it is <= the threshold rounded down to
+        # float32, so the comparison runs in float32 with no widening.
+        leaf = left == LEAF
+        order = np.concatenate([np.flatnonzero(~leaf), np.flatnonzero(leaf)])
+        renumber = np.empty(len(order), dtype=np.int32)
+        renumber[order] = np.arange(len(order), dtype=np.int32) * 2
+        self._internal = 2 * int(np.count_nonzero(~leaf))
+        self._order = order
+        self._feature = np.zeros(2 * len(order), dtype=np.int32)
+        self._feature[renumber] = feature
+        threshold32 = threshold.astype(np.float32)
+        above = threshold32 > threshold
+        threshold32[above] = np.nextafter(threshold32[above], np.float32(-np.inf))
+        self._threshold = np.zeros(2 * len(order), dtype=np.float32)
+        self._threshold[renumber] = threshold32
+        itself = np.arange(len(order))
+        self._children = np.empty(2 * len(order), dtype=np.int32)
+        self._children[renumber] = renumber[np.where(leaf, itself, left)]
+        self._children[renumber + 1] = renumber[np.where(leaf, itself, right)]
+        self._roots = renumber[roots]
+        # One contiguous row of leaf probabilities per class
+        self._value = np.ascontiguousarray(value[order].T)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be flattened")
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            leaf = tree.children_left == LEAF
+            # Leaves keep feature 0 so gathers stay in range; they are never compared
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(leaf, LEAF, tree.children_left + offset))
+            rights.append(np.where(leaf, LEAF, tree.children_right + offset))
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            proba = tree.value[:, 0, :]
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(proba / normalizer)
+
+            roots.append(offset)
+            offset += tree.node_count
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.int32),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.int32),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=model.classes_,
+            feature_names=model.feature_names_in_,
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    # Features as a float32 matrix, the dtype the trees were split on
+    def _as_matrix(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[list(self.feature_names_in_)]
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != len(self.feature_names_in_):
+            raise ValueError(f"Expected an array of shape (n, {len(self.feature_names_in_)}), got {X.shape}")
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity")
+        return X
+
+    # Leaf of every (tree, row) pair in the walk's numbering, stepping all
+    # pairs one level down at a time; once a quarter of the pairs still
+    # walking have reached a leaf, they are set aside and the rest go on
+    def _walk(self, X):
+        n_rows, n_features = X.shape
+        values = X.ravel()
+        nodes = np.repeat(self._roots, n_rows)
+        rows = np.tile(np.arange(0, n_rows * n_features, n_features, dtype=np.int32), self.n_estimators)
+        index = np.empty(nodes.size, dtype=np.int32)
+        x = np.empty(nodes.size, dtype=np.float32)
+        split = np.empty(nodes.size, dtype=np.float32)
+        flag = np.empty(nodes.size, dtype=bool)
+        leaves, walking = None, None
+        while True:
+            k = nodes.size
+            np.take(self._feature, nodes, out=index[:k])
+            index[:k] += rows
+            np.take(values, index[:k], out=x[:k])
+            np.take(self._threshold, nodes, out=split[:k])
+            np.greater(x[:k], split[:k], out=flag[:k])
+            nodes += flag[:k]
+            np.take(self._children, nodes, out=index[:k])
+            nodes, index = index[:k], nodes
+            np.greater_equal(nodes, self._internal, out=flag[:k])
+            done = np.count_nonzero(flag[:k])
+            if done == k:
+                break
+            if done * 4 >= k:
+                keep = ~flag[:k]
+                if leaves is None:
+                    leaves, walking = nodes.copy(), np.flatnonzero(keep)
+                else:
+                    leaves[walking] = nodes
+                    walking = walking[keep]
+                nodes, rows = nodes[keep], rows[keep]
+        if leaves is None:
+            leaves = nodes
+        else:
+            leaves[walking] = nodes
+        return leaves.reshape(self.n_estimators, n_rows) // 2
+
+    # Leaf reached by every (tree, row) pair, as a row index into value
+    def apply(self, X):
+        X = self._as_matrix(X)
+        return np.concatenate([self._order[self._walk(X[start:start + BLOCK_ROWS])]
+                               for start in range(0, max(X.shape[0], 1), BLOCK_ROWS)], axis=1)
+
+    def predict_proba(self, X):
+        X = self._as_matrix(X)
+        proba = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            leaves = self._walk(X[start:start + BLOCK_ROWS])
+            # (classes, trees, rows); reducing over the non-contiguous tree
+            # axis adds the trees one after another, in the same order as
+            # sklearn's accumulation, so the sums are identical
+            tree_proba = np.take(self._value, leaves, axis=1)
+            total = np.add.reduce(tree_proba, axis=1)
+            total /= self.n_estimators
+            proba[start:start + BLOCK_ROWS] = total.T
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+# Check the flat engine against sklearn on the given rows
+def verify(model, forest, X):
+    frame = X if isinstance(X, pd.DataFrame) else pd.DataFrame(X, columns=model.feature_names_in_)
+    return np.array_equal(forest.predict_proba(frame), model.predict_proba(frame))
+
+
+# Synthetic rows spanning the observed range of each feature
+def synthetic_rows(reference, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    low, high = reference.min().values, reference.max().values
+    return pd.DataFrame(rng.uniform(low, high, size=(n_rows, len(low))), columns=reference.columns)
+
+
+def _best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Time sklearn against the flat engine for each batch size
+def benchmark(model, forest, reference, sizes, repeat=5):
+    results = []
+    for n_rows in sizes:
+        X = synthetic_rows(reference, n_rows)
+        sklearn_s = _best_time(lambda: model.predict_proba(X), repeat)
+        flat_s = _best_time(lambda: forest.predict_proba(X), repeat)
+        results.append({
+            'rows': n_rows,
+            'sklearn_s': sklearn_s,
+            'flat_s': flat_s,
+            'speedup': sklearn_s / flat_s,
+            'identical': verify(model, forest, X),
+        })
+    return results
+
+
+def main(argv=None):
+    from scoring import DATA_PATH, MODEL_PATH, load_model
+
+    parser = argparse.ArgumentParser(description="Benchmark the flattened forest against sklearn.")
+    parser.add_argument('--model', default=MODEL_PATH, help="path to the pickled model")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 100, 10_000, 100_000],
+                        help="batch sizes to time")
+    parser.add_argument('--repeat', type=int, default=5, help="timing repetitions per size")
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model)
+    forest = FlatForest.from_sklearn(model)
+    reference = pd.read_csv(DATA_PATH)[list(model.feature_names_in_)]
+
+    print(f"Reference data identical: {verify(model, forest, reference)}")
+    print(f"{'rows':>10} {'sklearn':>12} {'flat':>12} {'speedup':>9}  identical")
+    for row in benchmark(model, forest, reference, args.rows, args.repeat):
+        print(f"{row['rows']:>10} {row['sklearn_s'] * 1e3:>10.3f}ms {row['flat_s'] * 1e3:>10.3f}ms "
+              f"{row['speedup']:>8.1f}x  {row['identical']}")
+
+
+if __name__ == '__main__':
+    main()
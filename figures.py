@@ -0,0 +1,187 @@
+# Figures shared by the app and benchmark.py.
+#
+# Each builder runs on a worker thread, draws on an Agg canvas (no pyplot,
+# no Tk) and returns (figure, key, state), or None when the figure drawn for
+# current_key is still up to date. The `task` argument is anything with a
+# checkpoint() method, normally a background_tasks.Task. matplotlib is
+# imported on first use, so importing this module stays cheap.
+import threading
+import time
+
+from instrumentation import stage
+
+# Modern color scheme - Enhanced for better visibility
+BG_COLOR = "#0d1117"  # GitHub dark background
+CARD_BG = "#161b22"  # Lighter card background for contrast
+CARD_BORDER = "#30363d"  # Subtle border
+ACCENT_CYAN = "#58a6ff"  # Brighter cyan
+ACCENT_PURPLE = "#bc8cff"  # Brighter purple
+ACCENT_GREEN = "#3fb950"  # Brighter green
+ACCENT_RED = "#f85149"  # Brighter red
+ACCENT_ORANGE = "#ffa657"  # Brighter orange
+TEXT_COLOR = "#f0f6fc"  # Very light text for maximum visibility
+TEXT_MUTED = "#8b949e"  # Slightly lighter muted text
+TEXT_BRIGHT = "#ffffff"  # Pure white for important text
+
+COMPARISON_TITLE = "📊 Input Comparison Analysis"
+CONFUSION_TITLE = "🔮 Model Performance Matrix"
+WEATHER_TITLE = "📈 Weather Data Analysis Dashboard"
+
+# Plotting modules are imported on first use, by whichever worker needs them
+plotting_lock = threading.Lock()
+plotting_ready = False
+
+def load_plotting():
+    global plotting_ready
+    with plotting_lock:
+        if not plotting_ready:
+            start = time.perf_counter()
+            import matplotlib.style
+            # Modern dark theme for every plot; set once before any figure is built
+            matplotlib.style.use('dark_background')
+            plotting_ready = True
+            print(f"Plotting modules loaded in {time.perf_counter() - start:.2f}s")
+
+# Function to create a figure off the main thread (Agg canvas, no pyplot)
+def new_figure(**kwargs):
+    load_plotting()
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+# Dataset means beside the entered values; the input bars are returned
+# so the view can update them in place
+def build_comparison_figure(task, comparison, input_values):
+    fig = new_figure(figsize=(10, 6), facecolor='#1a1f3a')
+    ax = fig.subplots()
+    ax.set_facecolor('#1a1f3a')
+    
+    features = list(comparison.index)
+    x = range(len(features))
+    width = 0.35
+    
+    bars1 = ax.bar([i - width/2 for i in x], comparison.values, width, 
+                    color=ACCENT_CYAN, label="Dataset Average", alpha=0.8)
+    # Input bars are animated so later inputs can be blitted over the rest
+    bars2 = ax.bar([i + width/2 for i in x], input_values, width, 
+                    color=ACCENT_ORANGE, label="Your Input", alpha=0.8, animated=True)
+    
+    ax.set_xlabel("Weather Parameters", fontsize=12, fontweight="bold", color=TEXT_COLOR)
+    ax.set_ylabel("Value", fontsize=12, fontweight="bold", color=TEXT_COLOR)
+    ax.set_title(COMPARISON_TITLE, fontsize=16, fontweight="bold", 
+                 color=ACCENT_CYAN, pad=20)
+    ax.set_xticks(x)
+    ax.set_xticklabels(features, color=TEXT_COLOR)
+    ax.tick_params(colors=TEXT_COLOR)
+    ax.legend(facecolor='#2a2f4a', edgecolor=ACCENT_CYAN, labelcolor=TEXT_COLOR)
+    ax.grid(True, alpha=0.2, color=TEXT_MUTED, linestyle='--')
+    
+    task.checkpoint()
+    with stage("layout"):
+        fig.tight_layout()
+    return fig, None, {'ax': ax, 'input_bars': list(bars2)}
+
+# Confusion matrix of the held-out split; None when current_key is still current
+def build_confusion_figure(task, model, current_key):
+    from scoring import DATA_PATH
+    from evaluation_cache import cache_key, evaluate
+    # Rebuild only for another model or a changed dataset file
+    key = cache_key(model, DATA_PATH)
+    if key == current_key:
+        return None
+    # Split, predictions and matrix come from the evaluation cache
+    cm = evaluate(model).confusion
+    task.checkpoint()
+    
+    # Futuristic styling
+    fig = new_figure(figsize=(8, 7), facecolor='#1a1f3a')
+    ax = fig.subplots()
+    ax.set_facecolor('#1a1f3a')
+    
+    from sklearn.metrics import ConfusionMatrixDisplay
+    disp = ConfusionMatrixDisplay(cm, display_labels=['No Disaster', 'Disaster'])
+    disp.plot(cmap='viridis', ax=ax, colorbar=True, values_format='d')
+    ax.set_title(CONFUSION_TITLE, fontsize=16, fontweight="bold", 
+                 color=ACCENT_PURPLE, pad=20)
+    ax.set_xlabel("Predicted Label", fontsize=12, color=TEXT_COLOR, fontweight="bold")
+    ax.set_ylabel("True Label", fontsize=12, color=TEXT_COLOR, fontweight="bold")
+    ax.tick_params(colors=TEXT_COLOR)
+    
+    task.checkpoint()
+    with stage("layout"):
+        fig.tight_layout()
+    return fig, key, {}
+
+# Four-panel history of the dataset at `path` (the app's dataset by default)
+def build_weather_figure(task, current_key, path=None):
+    from scoring import DATA_PATH
+    from dataset_store import get_store
+    from lod import LODSeries, enable_zoom_pan
+    # Parsed once and shared; each series is drawn from a min/max pyramid
+    # at the resolution of its axes, so long datasets render in constant time
+    store = get_store(path or DATA_PATH)
+    key = (store.path, store.signature)
+    if key == current_key:
+        return None
+    series = []
+    
+    # Futuristic dark theme
+    fig = new_figure(figsize=(14, 10), facecolor='#1a1f3a')
+    ax = fig.subplots(2, 2)
+    
+    # Temperature plot
+    ax[0, 0].set_facecolor('#1a1f3a')
+    series.append(LODSeries(ax[0, 0], store.pyramid('temp'), ACCENT_RED, label='Temperature (°C)'))
+    ax[0, 0].xaxis_date()
+    ax[0, 0].set_title('🌡️ Temperature Trends', fontsize=13, fontweight="bold", 
+                       color=ACCENT_RED, pad=10)
+    ax[0, 0].grid(True, alpha=0.2, color=TEXT_MUTED, linestyle='--')
+    ax[0, 0].legend(facecolor='#2a2f4a', edgecolor=ACCENT_RED, labelcolor=TEXT_COLOR)
+    ax[0, 0].tick_params(colors=TEXT_COLOR)
+    task.checkpoint()
+    
+    # Wind Speed plot
+    ax[0, 1].set_facecolor('#1a1f3a')
+    series.append(LODSeries(ax[0, 1], store.pyramid('wspd'), ACCENT_CYAN, label='Wind Speed (m/s)'))
+    ax[0, 1].xaxis_date()
+    ax[0, 1].set_title('💨 Wind Speed Patterns', fontsize=13, fontweight="bold", 
+                       color=ACCENT_CYAN, pad=10)
+    ax[0, 1].grid(True, alpha=0.2, color=TEXT_MUTED, linestyle='--')
+    ax[0, 1].legend(facecolor='#2a2f4a', edgecolor=ACCENT_CYAN, labelcolor=TEXT_COLOR)
+    ax[0, 1].tick_params(colors=TEXT_COLOR)
+    task.checkpoint()
+    
+    # Humidity plot
+    ax[1, 0].set_facecolor('#1a1f3a')
+    series.append(LODSeries(ax[1, 0], store.pyramid('rhum'), ACCENT_GREEN, label='Humidity (%)'))
+    ax[1, 0].xaxis_date()
+    ax[1, 0].set_title('💧 Humidity Levels', fontsize=13, fontweight="bold", 
+                       color=ACCENT_GREEN, pad=10)
+    ax[1, 0].grid(True, alpha=0.2, color=TEXT_MUTED, linestyle='--')
+    ax[1, 0].legend(facecolor='#2a2f4a', edgecolor=ACCENT_GREEN, labelcolor=TEXT_COLOR)
+    ax[1, 0].tick_params(colors=TEXT_COLOR)
+    task.checkpoint()
+    
+    # Pressure plot
+    ax[1, 1].set_facecolor('#1a1f3a')
+    series.append(LODSeries(ax[1, 1], store.pyramid('pres'), ACCENT_PURPLE, label='Pressure (hPa)'))
+    ax[1, 1].xaxis_date()
+    ax[1, 1].set_title('📊 Atmospheric Pressure', fontsize=13, fontweight="bold", 
+                       color=ACCENT_PURPLE, pad=10)
+    ax[1, 1].grid(True, alpha=0.2, color=TEXT_MUTED, linestyle='--')
+    ax[1, 1].legend(facecolor='#2a2f4a', edgecolor=ACCENT_PURPLE, labelcolor=TEXT_COLOR)
+    ax[1, 1].tick_params(colors=TEXT_COLOR)
+    
+    fig.suptitle(WEATHER_TITLE, fontsize=16, fontweight="bold", 
+                 color=TEXT_COLOR, y=0.995)
+    
+    task.checkpoint()
+    with stage("layout"):
+        fig.tight_layout()
+    # Re-query at the final axes widths; wheel zooms, drag pans, double-click resets
+    for s in series:
+        s.update()
+    enable_zoom_pan(fig, series)
+    return fig, key, {}
@@ -0,0 +1,201 @@
+# Tiled scoring of gridded forecast fields into a risk raster.
+#
+# A forecast is one 2-D (y, x) or 3-D (time, y, x) array per model feature,
+# read from any of:
+#   - a directory holding temp.npy, wspd.npy, rhum.npy and pres.npy
+#     (memory-mapped, so only the tile being scored is read),
+#   - an .npz with one array per feature,
+#   - one .npy stacked along a leading feature axis, in model feature order.
+# The grid is cut into bands of whole rows holding at most --tile-cells cells.
+# Each band goes through validation and a single predict_proba call, so peak
+# memory depends on the tile size, not the grid. The output is the disaster
+# probability of every cell, float32 and of the same shape as the fields,
+# with NaN where the inputs are missing or out of range (e.g. masked cells).
+#
+#   python grid_scoring.py forecast/ -o risk.npy --png risk.png
+#   python grid_scoring.py --example forecast/ --shape 2000 2000     # synthetic fields
+import argparse
+import os
+import time
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+from scoring import MODEL_PATH, disaster_probability, load_model, score_validated
+from validation import BOUNDS
+
+FEATURES = ['temp', 'wspd', 'rhum', 'pres']
+# Cells scored per model call; bounds the memory of one tile
+DEFAULT_TILE_CELLS = 250_000
+
+GridReport = namedtuple('GridReport', ['cells', 'tiles', 'rejected', 'seconds'])
+
+
+# Fields of a forecast as {feature: array}, all of the same 2-D or 3-D shape
+def load_fields(path, features=FEATURES):
+    if os.path.isdir(path):
+        fields = {}
+        for feature in features:
+            field_path = os.path.join(path, feature + '.npy')
+            if not os.path.exists(field_path):
+                raise ValueError(f"{path} has no {feature}.npy")
+            fields[feature] = np.load(field_path, mmap_mode='r')
+    elif path.endswith('.npz'):
+        with np.load(path) as stored:
+            missing = [feature for feature in features if feature not in stored.files]
+            if missing:
+                raise ValueError(f"{path} is missing the fields: {', '.join(missing)}")
+            fields = {feature: stored[feature] for feature in features}
+    else:
+        stack = np.load(path, mmap_mode='r')
+        if stack.shape[0] != len(features) or stack.ndim not in (3, 4):
+            raise ValueError(f"Expected a stack of shape ({len(features)}, [time,] y, x), got {stack.shape}")
+        fields = dict(zip(features, stack))
+    shapes = {field.shape for field in fields.values()}
+    if len(shapes) != 1:
+        raise ValueError(f"Fields differ in shape: {sorted(shapes)}")
+    shape = shapes.pop()
+    if len(shape) not in (2, 3):
+        raise ValueError(f"Fields must be (y, x) or (time, y, x), got {shape}")
+    return fields
+
+
+# Rows per tile for rasters `width` cells wide
+def tile_rows(width, tile_cells=DEFAULT_TILE_CELLS):
+    return max(1, tile_cells // max(width, 1))
+
+
+# Score every cell, tile by tile; `out` may be a memory-mapped array, `risk`
+# maps probabilities to calibrated risk and `on_tile` is called after every
+# tile (the GUI uses it to stop superseded work)
+def score_grid(model, fields, out=None, tile_cells=DEFAULT_TILE_CELLS, risk=None, on_tile=None):
+    features = list(model.feature_names_in_)
+    missing = [feature for feature in features if feature not in fields]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    shape = fields[features[0]].shape
+    if out is None:
+        out = np.empty(shape, dtype=np.float32)
+    # Timesteps are scored one after another; a 2-D grid is one timestep
+    steps = [(lambda field: field)] if len(shape) == 2 else [
+        (lambda field, t=t: field[t]) for t in range(shape[0])]
+    height, width = shape[-2:]
+    rows = tile_rows(width, tile_cells)
+
+    tiles = rejected = 0
+    start = time.perf_counter()
+    for step in steps:
+        target = step(out)
+        for y in range(0, height, rows):
+            block = np.column_stack([np.asarray(step(fields[feature])[y:y + rows]).ravel()
+                                     for feature in features])
+            checked, result = score_validated(model, block)
+            probability = np.full(len(block), np.nan, dtype=np.float32)
+            if result.rows:
+                p = disaster_probability(model, result.probabilities)
+                probability[checked.valid] = risk(p) if risk is not None else p
+            target[y:y + rows] = probability.reshape(-1, width)
+            tiles += 1
+            rejected += result.rejected
+            if on_tile is not None:
+                on_tile()
+    return out, GridReport(int(np.prod(shape)), tiles, rejected, time.perf_counter() - start)
+
+
+# Highest risk of each cell over all timesteps, ignoring masked cells
+def peak_risk(raster):
+    if raster.ndim == 2:
+        return raster
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN cells stay NaN
+        return np.nanmax(raster, axis=0)
+
+
+# Heatmap of a 2-D risk raster on the given axes; large rasters are
+# resampled by imshow at the resolution of the axes
+def draw_heatmap(ax, raster, title=None, cmap='inferno'):
+    image = ax.imshow(raster, cmap=cmap, vmin=0.0, vmax=1.0, origin='upper', interpolation='nearest')
+    if title:
+        ax.set_title(title)
+    ax.set_xlabel("x (cells)")
+    ax.set_ylabel("y (cells)")
+    return image
+
+
+# Smooth synthetic fields spanning the observed range of each feature
+def example_fields(shape, seed=0):
+    rng = np.random.default_rng(seed)
+    height, width = shape[-2:]
+    y = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, np.newaxis]
+    x = np.linspace(0.0, 1.0, width, dtype=np.float32)[np.newaxis, :]
+    ranges = {'temp': (22.8, 32.5), 'wspd': (2.2, 20.5), 'rhum': (56.0, 99.0), 'pres': (1004.1, 1011.9)}
+    fields = {}
+    for feature, (low, high) in ranges.items():
+        fy, fx, phase = rng.uniform(1.0, 4.0), rng.uniform(1.0, 4.0), rng.uniform(0.0, 2 * np.pi)
+        wave = 0.5 + 0.25 * np.sin(2 * np.pi * fy * y + phase) + 0.25 * np.cos(2 * np.pi * fx * x - phase)
+        fields[feature] = (low + (high - low) * wave).astype(np.float32)
+    if len(shape) == 3:
+        drift = np.linspace(-0.5, 0.5, shape[0], dtype=np.float32)[:, np.newaxis, np.newaxis]
+        fields = {feature: field + drift * (ranges[feature][1] - ranges[feature][0]) * 0.2
+                  for feature, field in fields.items()}
+    return {feature: np.clip(field, *BOUNDS[feature]).astype(np.float32) for feature, field in fields.items()}
+
+
+def write_example(directory, shape, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    for feature, field in example_fields(shape, seed).items():
+        np.save(os.path.join(directory, feature + '.npy'), field)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score gridded forecast fields into a risk raster.")
+    parser.add_argument('input', nargs='?', help="directory of <feature>.npy, an .npz, or a stacked .npy")
+    parser.add_argument('-o', '--output', help="write the risk raster to this .npy")
+    parser.add_argument('--png', help="render the (peak) risk heatmap to this image")
+    parser.add_argument('--model', default=MODEL_PATH, help="pickled model or compact .npz export")
+    parser.add_argument('--calibrated', action='store_true',
+                        help="map probabilities to calibrated risk (see calibration.py)")
+    parser.add_argument('--tile-cells', type=int, default=DEFAULT_TILE_CELLS, help="cells scored per model call")
+    parser.add_argument('--example', metavar='DIR', help="write synthetic fields to DIR and exit")
+    parser.add_argument('--shape', type=int, nargs='+', default=[500, 500],
+                        help="[time] y x of the synthetic fields")
+    args = parser.parse_args(argv)
+
+    if args.example:
+        write_example(args.example, tuple(args.shape))
+        print(f"Wrote {'x'.join(map(str, args.shape))} synthetic fields to {args.example}")
+        return
+    if not args.input:
+        parser.error("input is required unless --example is given")
+
+    fields = load_fields(args.input)
+    model = load_model(args.model)
+    risk = None
+    if args.calibrated:
+        from calibration import get_calibration
+        risk = get_calibration(model, args.model).risk
+    out = None
+    if args.output:
+        out = np.lib.format.open_memmap(args.output, mode='w+', dtype=np.float32,
+                                        shape=next(iter(fields.values())).shape)
+    raster, report = score_grid(model, fields, out, args.tile_cells, risk)
+    print(f"Scored {report.cells:,} cells in {report.tiles} tiles in {report.seconds:.3f}s "
+          f"({report.cells / report.seconds if report.seconds > 0 else float('inf'):,.0f} cells/sec)")
+    if report.rejected:
+        print(f"Masked by validation: {report.rejected:,} cells (NaN in the raster)")
+    if args.output:
+        raster.flush()
+    if args.png:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure(figsize=(8, 7))
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        title = "Disaster risk" if raster.ndim == 2 else f"Peak disaster risk over {raster.shape[0]} timesteps"
+        fig.colorbar(draw_heatmap(ax, peak_risk(raster), title), ax=ax, label="Disaster probability")
+        fig.savefig(args.png, dpi=100)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+# Asynchronous multi-station ingestion with batched scoring and alerts.
+#
+# Station feeds - tailed files (CSV with a header, or JSON lines) and TCP
+# connections sending JSON lines - run as asyncio tasks that normalise each
+# reading to the model's schema and put it on a bounded queue. A single
+# consumer takes whatever has queued up (up to --max-batch readings, waiting
+# at most --window-ms for more), validates the batch in one pass and scores
+# it with one predict_proba call on a worker thread. Readings predicted as a
+# disaster are emitted as JSON alerts with the station's rolling features.
+#
+# The queue is the backpressure point: when scoring falls behind, put()
+# blocks, file tails stop reading and sockets stop being read (so TCP flow
+# control slows the senders), and memory stays bounded by --queue-size.
+#
+#   python ingestion.py --tail feeds/*.csv --listen 127.0.0.1:9009 --alerts alerts.jsonl
+#   python ingestion.py --simulate 2000 --duration 10            # load test
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from rolling_features import FeatureEngine
+from scoring import MODEL_PATH, disaster_probability, load_model, score_batch
+from validation import validate
+
+DEFAULT_QUEUE_SIZE = 10_000
+DEFAULT_MAX_BATCH = 2048
+DEFAULT_WINDOW_MS = 20.0
+# Seconds between reads of a file that has no new data
+DEFAULT_POLL = 0.5
+
+# Field names used by common feeds, mapped to the dataset's columns
+ALIASES = {
+    'temperature': 'temp', 'wind_speed': 'wspd', 'windspeed': 'wspd', 'humidity': 'rhum',
+    'relative_humidity': 'rhum', 'pressure': 'pres', 'dew_point': 'dwpt', 'dewpoint': 'dwpt',
+    'precipitation': 'prcp', 'rain': 'prcp', 'timestamp': 'time',
+}
+
+Reading = namedtuple('Reading', ['station', 'time', 'fields'])
+
+
+# Rename known aliases and pull out the station and time of a raw record
+def normalize(record, default_station=None):
+    fields = {ALIASES.get(key.strip().lower(), key.strip().lower()): value for key, value in record.items()}
+    station = fields.pop('station', None) or default_station
+    t = fields.pop('time', None)
+    return Reading(str(station), t if t not in (None, '') else time.time(), fields)
+
+
+class IngestionPipeline:
+    def __init__(self, model, queue_size=DEFAULT_QUEUE_SIZE, max_batch=DEFAULT_MAX_BATCH,
+                 window_ms=DEFAULT_WINDOW_MS, on_alert=None):
+        self.model = model
+        self.features = list(model.feature_names_in_)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self.on_alert = on_alert or print_alert
+        self.engine = FeatureEngine()
+        self.readings = 0
+        self.rejected = 0
+        self.batches = 0
+        self.alerts = 0
+        self.failed = 0  # readings skipped because scoring or alerting raised
+        self.blocked = 0  # puts that had to wait for room in the queue
+        self.peak_queue = 0
+        self.started = time.perf_counter()
+        self.connections = set()  # tasks serving TCP feeds
+
+    # Queue one raw record, waiting while the queue is full
+    async def put(self, record, default_station=None):
+        if self.queue.full():
+            self.blocked += 1
+        await self.queue.put(normalize(record, default_station))
+        self.peak_queue = max(self.peak_queue, self.queue.qsize())
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    # Score queued readings in batches until cancelled. A batch or reading
+    # that fails is reported and skipped; the consumer itself never stops,
+    # since the feeds would then block on the full queue for good
+    async def consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            try:
+                await self._score(loop, batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Skipped a batch of {len(batch)} readings: {e!r}", file=sys.stderr)
+            finally:
+                self.readings += len(batch)
+                self.batches += 1
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _score(self, loop, batch):
+        checked = validate([reading.fields for reading in batch], self.features)
+        valid = np.flatnonzero(checked.valid)
+        self.rejected += len(batch) - len(valid)
+        if not len(valid):
+            return
+        # Inference runs on a thread so feeds keep filling the queue
+        result = await loop.run_in_executor(None, score_batch, self.model, checked.values[valid])
+        probability = disaster_probability(self.model, result.probabilities)
+        for k, i in enumerate(valid):
+            try:
+                self._observe(batch[i], checked.values[i], result.predictions[k], probability[k])
+            except Exception as e:
+                self.failed += 1
+                print(f"Skipped a reading from {batch[i].station}: {e!r}", file=sys.stderr)
+
+    def _observe(self, reading, values, prediction, probability):
+        try:
+            rolling = self.engine.update(reading.station, reading.time, reading.fields)
+        except (TypeError, ValueError):
+            rolling = {}  # out-of-order or unparseable time, or a null field: no rolling features
+        if prediction != 1:
+            return
+        self.on_alert({
+            'station': reading.station,
+            'time': str(reading.time),
+            'disaster_probability': float(probability),
+            **dict(zip(self.features, map(float, values))),
+            **{name: value for name, value in rolling.items() if not math.isnan(value)},
+        })
+        self.alerts += 1
+
+    # Follow a file like `tail -f`, from its first line
+    async def tail(self, path, station=None, poll=DEFAULT_POLL):
+        station = station or os.path.splitext(os.path.basename(path))[0]
+        header = None
+        pending = b''
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(1 << 16)
+                if not chunk:
+                    await asyncio.sleep(poll)
+                    continue
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()  # incomplete last line
+                for line in lines:
+                    line = line.strip().decode('utf-8', 'replace')
+                    if not line:
+                        continue
+                    if line.startswith('{'):
+                        record = _json_record(line)
+                    elif header is None:
+                        header = [name.strip() for name in line.split(',')]
+                        continue
+                    else:
+                        record = dict(zip(header, line.split(',')))
+                    if record is not None:
+                        await self.put(record, station)
+
+    # Accept TCP connections that send one JSON reading per line
+    async def listen(self, host, port):
+        async def handle(reader, writer):
+            peer = '%s:%s' % writer.get_extra_info('peername')[:2]
+            task = asyncio.current_task()
+            self.connections.add(task)
+            try:
+                while line := await reader.readline():
+                    record = _json_record(line.decode('utf-8', 'replace'))
+                    if record is not None:
+                        await self.put(record, peer)
+            finally:
+                self.connections.discard(task)
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+    def stats(self):
+        seconds = time.perf_counter() - self.started
+        return {
+            'readings': self.readings,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'mean_batch_size': self.readings / self.batches if self.batches else 0.0,
+            'alerts': self.alerts,
+            'failed': self.failed,
+            'stations': len(self.engine.stations),
+            'queue_depth': self.queue.qsize(),
+            'peak_queue_depth': self.peak_queue,
+            'blocked_puts': self.blocked,
+            'readings_per_sec': self.readings / seconds if seconds > 0 else 0.0,
+        }
+
+
+def _json_record(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def print_alert(alert):
+    print(json.dumps(alert), flush=True)
+
+
+def alert_writer(path):
+    f = open(path, 'a', buffering=1)
+    return lambda alert: f.write(json.dumps(alert) + '\n')
+
+
+# Synthetic station sending one reading every `interval` seconds, with a
+# random phase so thousands of stations do not fire in lockstep
+async def simulated_station(pipeline, station, interval, rng):
+    await asyncio.sleep(rng.random() * interval)
+    pres = rng.uniform(995.0, 1020.0)
+    while True:
+        pres += rng.gauss(0.0, 0.3)
+        await pipeline.put({
+            'station': station,
+            'time': time.time(),
+            'temp': round(rng.uniform(18.0, 32.0), 1),
+            'wspd': round(rng.uniform(0.0, 30.0), 1),
+            'rhum': round(rng.uniform(50.0, 100.0)),
+            'pres': round(pres, 1),
+            'prcp': round(max(rng.gauss(0.5, 2.0), 0.0), 1),
+            'dwpt': round(rng.uniform(15.0, 25.0), 1),
+        })
+        await asyncio.sleep(interval)
+
+
+async def run(model, args):
+    on_alert = alert_writer(args.alerts) if args.alerts else (print_alert if args.print_alerts else lambda alert: None)
+    pipeline = IngestionPipeline(model, args.queue_size, args.max_batch, args.window_ms, on_alert)
+    consumer = asyncio.create_task(pipeline.consume())
+    tasks = []
+    servers = []
+    for path in args.tail or []:
+        tasks.append(asyncio.create_task(pipeline.tail(path)))
+    if args.listen:
+        host, _, port = args.listen.rpartition(':')
+        servers.append(await pipeline.listen(host or '127.0.0.1', int(port)))
+        print(f"Listening for JSON readings on {args.listen}", file=sys.stderr)
+    rng = random.Random(42)
+    for i in range(args.simulate):
+        tasks.append(asyncio.create_task(simulated_station(pipeline, f'SIM{i:05d}', args.interval, rng)))
+
+    async def report():
+        while True:
+            await asyncio.sleep(args.report_every)
+            print(json.dumps(pipeline.stats()), file=sys.stderr)
+
+    tasks.append(asyncio.create_task(report()))
+    try:
+        if args.duration:
+            await asyncio.sleep(args.duration)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        # Stop the feeds first, score what they already queued, then stop the
+        # consumer once nothing can reach the queue any more
+        for server in servers:
+            server.close()
+        tasks.extend(pipeline.connections)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await pipeline.queue.join()
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+        print(json.dumps(pipeline.stats()), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest station feeds, score them in batches and emit alerts.")
+    parser.add_argument('--tail', nargs='+', metavar='FILE', help="feed files to follow (CSV or JSON lines)")
+    parser.add_argument('--listen', metavar='HOST:PORT', help="accept JSON-lines readings over TCP")
+    parser.add_argument('--simulate', type=int, default=0, metavar='STATIONS',
+                        help="add this many synthetic stations (load testing)")
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help="seconds between readings of a synthetic station")
+    parser.add_argument('--model', default=MODEL_PATH, help="pickled model or compact .npz export")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="readings buffered before feeds are paused")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument('--window-ms', type=float, default=DEFAULT_WINDOW_MS,
+                        help="how long to wait for more readings to batch together")
+    parser.add_argument('--alerts', help="append alerts to this JSON-lines file instead of stdout")
+    parser.add_argument('--quiet', dest='print_alerts', action='store_false', help="do not print alerts")
+    parser.add_argument('--duration', type=float, help="stop after this many seconds")
+    parser.add_argument('--report-every', type=float, default=5.0, help="seconds between stats lines on stderr")
+    args = parser.parse_args(argv)
+    if not (args.tail or args.listen or args.simulate):
+        parser.error("Give at least one of --tail, --listen or --simulate")
+
+    model = load_model(args.model)
+    try:
+        asyncio.run(run(model, args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+# Lightweight stage timing and per-action profiling.
+#
+# Code marks its hot paths with `with stage("inference"):` and whole user
+# actions with `with action("predict"):`. While tracing is off (the default)
+# stage() returns a shared no-op context manager, so instrumented code pays
+# one function call per stage. Tracing is switched on with the
+# CLOUDBURST_TRACE=1 environment variable or a tool's --trace flag; every
+# stage then records its latency into a log-bucketed histogram.
+#
+# CLOUDBURST_PROFILE=cprofile (or =pyinstrument, if it is installed) also
+# profiles every action and writes one report per action to
+# .cache/profiles/. export() writes the aggregated histograms as JSON.
+#
+#   CLOUDBURST_TRACE=1 python disaster_prediction_model_final.py
+#   CLOUDBURST_TRACE=1 CLOUDBURST_PROFILE=cprofile python scoring.py data.csv
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.path.join(script_dir, '.cache', 'profiles')
+
+# Histogram bucket upper bounds in seconds: 1us to ~67s, doubling
+BOUNDS = [1e-6 * 2 ** i for i in range(27)]
+PROFILERS = ('cprofile', 'pyinstrument')
+
+_NULL = contextlib.nullcontext()
+_enabled = False
+_profiler = None
+_histograms = {}
+_lock = threading.Lock()
+_action_counts = {}
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    # Upper bound of the bucket holding the q-th quantile, capped at the max
+    def quantile(self, q):
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(BOUNDS[i] if i < len(BOUNDS) else self.max, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000.0,
+            'mean_ms': self.total / self.count * 1000.0 if self.count else 0.0,
+            'min_ms': self.min * 1000.0 if self.count else 0.0,
+            'p50_ms': self.quantile(0.5) * 1000.0,
+            'p90_ms': self.quantile(0.9) * 1000.0,
+            'p99_ms': self.quantile(0.99) * 1000.0,
+            'max_ms': self.max * 1000.0,
+            'buckets': {f'{bound * 1000.0:g}': count
+                        for bound, count in zip(BOUNDS + [float('inf')], self.counts) if count},
+        }
+
+
+def enable(profiler=None):
+    global _enabled, _profiler
+    if profiler is not None and profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler {profiler!r}; expected one of {', '.join(PROFILERS)}")
+    _enabled = True
+    _profiler = profiler
+
+
+def disable():
+    global _enabled, _profiler
+    _enabled = False
+    _profiler = None
+
+
+def enabled():
+    return _enabled
+
+
+def record(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds)
+
+
+@contextlib.contextmanager
+def _timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+# Time the enclosed block as `name`; a no-op while tracing is off
+def stage(name):
+    return _timed(name) if _enabled else _NULL
+
+
+# Time a whole user action and, if a profiler is selected, profile it
+def action(name):
+    if not _enabled:
+        return _NULL
+    return _profiled(name) if _profiler else _timed('action:' + name)
+
+
+@contextlib.contextmanager
+def _profiled(name):
+    with _lock:
+        number = _action_counts[name] = _action_counts.get(name, 0) + 1
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f'{name}-{os.getpid()}-{number:04d}')
+
+    profiler = None
+    if _profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+        except ImportError:
+            profiler = None
+    if profiler is not None:
+        profiler.start()
+        try:
+            with _timed('action:' + name):
+                yield
+        finally:
+            profiler.stop()
+            with open(path + '.html', 'w') as f:
+                f.write(profiler.output_html())
+        return
+
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another action is already being profiled; just time this one
+        with _timed('action:' + name):
+            yield
+        return
+    try:
+        with _timed('action:' + name):
+            yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path + '.prof')
+
+
+def snapshot():
+    with _lock:
+        return {name: histogram.summary() for name, histogram in sorted(_histograms.items())}
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def export(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'stages': snapshot()}, f, indent=2)
+
+
+def format_table(stats=None):
+    stats = snapshot() if stats is None else stats
+    lines = [f"{'stage':<28} {'count':>7} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    for name, s in stats.items():
+        lines.append(f"{name:<28} {s['count']:>7} {s['mean_ms']:>9.3f} {s['p50_ms']:>9.3f} "
+                     f"{s['p99_ms']:>9.3f} {s['max_ms']:>9.3f}")
+    return '\n'.join(lines)
+
+
+# Switched on from the environment at import time; choosing a profiler
+# implies tracing
+if os.environ.get('CLOUDBURST_TRACE', '') not in ('', '0') or os.environ.get('CLOUDBURST_PROFILE'):
+    enable(os.environ.get('CLOUDBURST_PROFILE') if os.environ.get('CLOUDBURST_PROFILE') in PROFILERS else None)
@@ -0,0 +1,160 @@
+# Level-of-detail rendering for long time series.
+#
+# A MinMaxPyramid keeps the raw series plus coarser levels in which every
+# bucket of REDUCTION consecutive samples is replaced by its minimum and its
+# maximum, in time order, so peaks and troughs survive downsampling. A query
+# for a visible x-range picks the finest level with at most one bucket per
+# pixel of the axes, which bounds the number of vertices handed to Agg by the canvas
+# width instead of by the length of the dataset.
+#
+# LODSeries draws a line + fill from a pyramid and re-queries it whenever the
+# axes' x-limits change; enable_zoom_pan adds wheel zoom, drag pan and
+# double-click reset to a figure.
+import numpy as np
+
+# Samples merged per bucket from one level to the next
+REDUCTION = 2
+# Stop adding levels once a level has this few buckets
+MIN_BUCKETS = 128
+# Zoom factor per mouse-wheel step
+ZOOM_STEP = 1.5
+
+
+class MinMaxPyramid:
+    def __init__(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.x = x
+        self.y = y
+        # Level 0 is the raw series; every level stores its interleaved
+        # (x, y) vertices and the number of raw samples per bucket
+        self.levels = [(x, y, 1)]
+        x_min, y_min, x_max, y_max = x, y, x, y
+        bucket = 1
+        while len(y_min) > MIN_BUCKETS:
+            x_min, y_min, x_max, y_max = _reduce(x_min, y_min, x_max, y_max)
+            bucket *= REDUCTION
+            self.levels.append(_interleave(x_min, y_min, x_max, y_max) + (bucket,))
+
+    def __len__(self):
+        return len(self.x)
+
+    # Vertices covering [x0, x1] with at most `pixels` buckets across
+    def query(self, x0, x1, pixels):
+        count = np.searchsorted(self.x, x1, side='right') - np.searchsorted(self.x, x0, side='left')
+        for level in self.levels:
+            if count / level[2] <= pixels:
+                break
+        xs, ys, _ = level
+        # One vertex beyond each edge keeps the line continuous while panning
+        start = max(np.searchsorted(xs, x0, side='left') - 1, 0)
+        stop = min(np.searchsorted(xs, x1, side='right') + 1, len(xs))
+        return xs[start:stop], ys[start:stop]
+
+
+# Merge REDUCTION neighbouring buckets, keeping the extremes and where they occur
+def _reduce(x_min, y_min, x_max, y_max):
+    pad = -len(y_min) % REDUCTION
+    if pad:
+        x_min, y_min, x_max, y_max = (np.concatenate([a, np.repeat(a[-1:], pad)])
+                                      for a in (x_min, y_min, x_max, y_max))
+    shape = (-1, REDUCTION)
+    # NaN gaps never win the min/max selection
+    i_min = np.argmin(np.where(np.isnan(y_min), np.inf, y_min).reshape(shape), axis=1)
+    i_max = np.argmax(np.where(np.isnan(y_max), -np.inf, y_max).reshape(shape), axis=1)
+    rows = np.arange(len(i_min))
+    return (x_min.reshape(shape)[rows, i_min], y_min.reshape(shape)[rows, i_min],
+            x_max.reshape(shape)[rows, i_max], y_max.reshape(shape)[rows, i_max])
+
+
+# Emit each bucket's minimum and maximum in time order
+def _interleave(x_min, y_min, x_max, y_max):
+    min_first = x_min <= x_max
+    xs = np.empty(2 * len(x_min))
+    ys = np.empty(2 * len(y_min))
+    xs[0::2] = np.where(min_first, x_min, x_max)
+    xs[1::2] = np.where(min_first, x_max, x_min)
+    ys[0::2] = np.where(min_first, y_min, y_max)
+    ys[1::2] = np.where(min_first, y_max, y_min)
+    return xs, ys
+
+
+class LODSeries:
+    def __init__(self, ax, pyramid, color, label=None, linewidth=2, alpha=0.9, fill_alpha=0.2):
+        self.ax = ax
+        self.pyramid = pyramid
+        self.color = color
+        self.fill_alpha = fill_alpha
+        self.fill = None
+        self.line, = ax.plot([], [], label=label, color=color, linewidth=linewidth, alpha=alpha)
+
+        # Full extent, with the fill's baseline at zero included like fill_between
+        y_low, y_high = min(np.nanmin(pyramid.y), 0.0), max(np.nanmax(pyramid.y), 0.0)
+        margin = (y_high - y_low) * 0.05 or 1.0
+        self.home = (pyramid.x[0], pyramid.x[-1])
+        ax.set_ylim(y_low - margin, y_high + margin)
+        ax.set_xlim(*self.home)
+        self.update()
+        ax.callbacks.connect('xlim_changed', lambda changed: self.update())
+
+    # Re-query the pyramid for the visible range at the current axes width
+    def update(self):
+        x0, x1 = self.ax.get_xlim()
+        pixels = max(int(self.ax.bbox.width), 1)
+        x, y = self.pyramid.query(x0, x1, pixels)
+        self.line.set_data(x, y)
+        if self.fill is not None:
+            self.fill.remove()
+        self.fill = self.ax.fill_between(x, y, alpha=self.fill_alpha, color=self.color)
+
+    def reset(self):
+        self.ax.set_xlim(*self.home)
+
+
+# Mouse-wheel zoom, left-drag pan and double-click reset for LOD series
+def enable_zoom_pan(fig, series):
+    by_axes = {s.ax: s for s in series}
+    drag = {}
+
+    def on_scroll(event):
+        s = by_axes.get(event.inaxes)
+        if s is None or event.xdata is None:
+            return
+        scale = 1 / ZOOM_STEP if event.button == 'up' else ZOOM_STEP
+        x0, x1 = s.ax.get_xlim()
+        home_width = s.home[1] - s.home[0]
+        width = min((x1 - x0) * scale, home_width)
+        left = event.xdata - (event.xdata - x0) * width / (x1 - x0)
+        left = min(max(left, s.home[0]), s.home[1] - width)
+        s.ax.set_xlim(left, left + width)
+        fig.canvas.draw_idle()
+
+    def on_press(event):
+        s = by_axes.get(event.inaxes)
+        if s is None:
+            return
+        if event.dblclick:
+            s.reset()
+            fig.canvas.draw_idle()
+        elif event.button == 1:
+            drag['series'] = s
+            drag['x'] = event.x
+            drag['xlim'] = s.ax.get_xlim()
+
+    def on_motion(event):
+        s = drag.get('series')
+        if s is None:
+            return
+        x0, x1 = drag['xlim']
+        shift = (event.x - drag['x']) * (x1 - x0) / max(s.ax.bbox.width, 1)
+        shift = min(max(shift, x1 - s.home[1]), x0 - s.home[0])
+        s.ax.set_xlim(x0 - shift, x1 - shift)
+        fig.canvas.draw_idle()
+
+    def on_release(event):
+        drag.clear()
+
+    fig.canvas.mpl_connect('scroll_event', on_scroll)
+    fig.canvas.mpl_connect('button_press_event', on_press)
+    fig.canvas.mpl_connect('motion_notify_event', on_motion)
+    fig.canvas.mpl_connect('button_release_event', on_release)
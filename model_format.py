@@ -0,0 +1,276 @@
+# Compact, versioned model format for the flattened forest.
+#
+# `export` writes the FlatForest node arrays (see fast_forest.py), the
+# feature names and the classes as uncompressed .npy members of one .npz
+# file, with a meta.json member holding the format version, a schema hash and
+# a SHA-256 of the array contents. Each member is padded so its data starts
+# on a 64-byte boundary.
+#
+# `load` reads the zip directory and the .npy headers to find where each
+# array's bytes sit in the file. It then maps the file once and views the
+# arrays straight out of the mapping, so nothing is unpickled and sklearn is
+# never imported. FlatForest derives its walk tables from those arrays, so
+# every process still builds a private copy of the tables on load. The
+# schema hash and the array sizes are checked on every load; the content
+# checksum is checked when asked for (`check`, or load(path, verify=True)),
+# since hashing every array would cost more than the load itself. A corrupt,
+# truncated or incompatible file raises ValueError.
+#
+# The file only holds plain arrays, so it does not depend on the sklearn
+# version the forest was trained with.
+#
+#   python model_format.py export                       # refined_disaster_prediction_model.npz
+#   python model_format.py export --model models/model-v0003.pkl -o v3.npz
+#   python model_format.py check refined_disaster_prediction_model.npz
+import argparse
+import hashlib
+import io
+import json
+import os
+import struct
+import time
+import zipfile
+
+import numpy as np
+
+from fast_forest import FlatForest
+
+FORMAT = 'cloudburst-flat-forest'
+FORMAT_VERSION = 2
+SUFFIX = '.npz'
+META_MEMBER = 'meta.json'
+# Data of every member starts on this boundary, like .npy headers
+ALIGNMENT = 64
+# Zip extra-field id used for alignment padding
+_PADDING_ID = 0xD935
+
+
+def compact_path(model_path):
+    return os.path.splitext(model_path)[0] + SUFFIX
+
+
+def is_compact(path):
+    return path.endswith(SUFFIX)
+
+
+NODE_ARRAYS = ['feature', 'threshold', 'left', 'right', 'value', 'roots']
+
+
+def _arrays(forest):
+    arrays = {
+        'classes': np.asarray(forest.classes_),
+        'feature_names': np.asarray([str(name) for name in forest.feature_names_in_]),
+    }
+    for name in NODE_ARRAYS:
+        arrays[name] = getattr(forest, name)
+    return {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+
+# Hash of the layout: format, features, classes and every array's dtype and shape
+def schema_hash(feature_names, classes, arrays):
+    schema = {
+        'format': FORMAT,
+        'version': FORMAT_VERSION,
+        'features': [str(name) for name in feature_names],
+        'classes': np.asarray(classes).tolist(),
+        'arrays': {name: [array.dtype.str, list(array.shape)] for name, array in sorted(arrays.items())},
+    }
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+
+def content_hash(arrays):
+    digest = hashlib.sha256()
+    for name, array in sorted(arrays.items()):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(array).view(np.uint8))
+    return digest.hexdigest()
+
+
+def _padding(position, name):
+    length = (-(position + 30 + len(name.encode()))) % ALIGNMENT
+    if 0 < length < 4:
+        length += ALIGNMENT  # an extra field needs at least its 4-byte header
+    return struct.pack('<HH', _PADDING_ID, length - 4) + bytes(length - 4) if length else b''
+
+
+def _write_member(archive, name, payload):
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    info.extra = _padding(archive.fp.tell(), name)
+    archive.writestr(info, payload)
+
+
+# Write a forest (sklearn or already flattened) to path; returns the metadata
+def export(model, path, source_path=None):
+    forest = model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+    arrays = _arrays(forest)
+    meta = {
+        'format': FORMAT,
+        'version': FORMAT_VERSION,
+        'schema': schema_hash(forest.feature_names_in_, forest.classes_, arrays),
+        'sha256': content_hash(arrays),
+        'feature_names': [str(name) for name in forest.feature_names_in_],
+        'classes': np.asarray(forest.classes_).tolist(),
+        'n_estimators': int(forest.n_estimators),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    if source_path:
+        from evaluation_cache import file_hash
+        meta['source'] = {'path': os.path.basename(source_path), 'sha256': file_hash(source_path)}
+
+    tmp_path = path + '.tmp'
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED) as archive:
+        _write_member(archive, META_MEMBER, json.dumps(meta, indent=2).encode())
+        for name, array in arrays.items():
+            buffer = io.BytesIO()
+            np.lib.format.write_array(buffer, array, allow_pickle=False)
+            _write_member(archive, name + '.npy', buffer.getvalue())
+    os.replace(tmp_path, path)
+    return meta
+
+
+# Byte range of every member's data, from the zip directory and local headers
+def _member_ranges(path, f):
+    ranges = {}
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"{path} is not a compact model: {e}")
+    with archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{info.filename} in {path} is compressed and cannot be memory-mapped")
+            f.seek(info.header_offset)
+            header = f.read(30)
+            if len(header) < 30 or header[:4] != b'PK\x03\x04':
+                raise ValueError(f"{path} has a damaged zip header for {info.filename}")
+            name_length, extra_length = struct.unpack('<HH', header[26:30])
+            ranges[info.filename] = (info.header_offset + 30 + name_length + extra_length, info.file_size)
+    return ranges
+
+
+def read_meta(path):
+    with open(path, 'rb') as f:
+        ranges = _member_ranges(path, f)
+        if META_MEMBER not in ranges:
+            raise ValueError(f"{path} is not a compact model (no {META_MEMBER})")
+        start, size = ranges[META_MEMBER]
+        f.seek(start)
+        return json.loads(f.read(size))
+
+
+# Metadata and memory-mapped arrays of a compact model
+def _open(path):
+    arrays = {}
+    with open(path, 'rb') as f:
+        ranges = _member_ranges(path, f)
+        if META_MEMBER not in ranges:
+            raise ValueError(f"{path} is not a compact model (no {META_MEMBER})")
+        start, size = ranges.pop(META_MEMBER)
+        f.seek(start)
+        meta = json.loads(f.read(size))
+        headers = {}
+        for name, (start, size) in ranges.items():
+            if not name.endswith('.npy'):
+                continue
+            f.seek(start)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"{name} in {path} holds Python objects")
+            offset = f.tell()
+            nbytes = int(np.prod(shape)) * dtype.itemsize
+            if offset - start + nbytes != size:
+                raise ValueError(f"{name} in {path} is truncated")
+            headers[name[:-len('.npy')]] = (offset, nbytes, shape, fortran_order, dtype)
+
+    mapping = np.memmap(path, dtype=np.uint8, mode='r')
+    for name, (offset, nbytes, shape, fortran_order, dtype) in headers.items():
+        arrays[name] = mapping[offset:offset + nbytes].view(dtype).reshape(shape, order='F' if fortran_order else 'C')
+    return meta, arrays
+
+
+# Load a compact model as a FlatForest whose node arrays are views of the
+# file; verify also checks the content checksum
+def load(path, verify=False):
+    meta, arrays = _open(path)
+    if meta.get('format') != FORMAT or meta.get('version') != FORMAT_VERSION:
+        raise ValueError(f"{path} is format {meta.get('format')} v{meta.get('version')}, "
+                         f"expected {FORMAT} v{FORMAT_VERSION}")
+    try:
+        feature_names = np.array([str(name) for name in arrays['feature_names']], dtype=object)
+        classes = np.array(arrays['classes'])
+        if schema_hash(feature_names, classes, arrays) != meta['schema']:
+            raise ValueError(f"{path} does not match its schema hash")
+        if verify and content_hash(arrays) != meta['sha256']:
+            raise ValueError(f"{path} failed its integrity check")
+        nodes = {name: arrays[name] for name in NODE_ARRAYS}
+        forest = FlatForest(classes=classes, feature_names=feature_names, **nodes)
+    except KeyError as e:
+        raise ValueError(f"{path} is missing the {e.args[0]} array")
+    # Hash of the pickled model this was exported from (of the arrays when
+    # unknown), read from the same file as the arrays; caches key on it
+    forest.source_sha256 = meta.get('source', {}).get('sha256') or meta['sha256']
+    return forest
+
+
+# Path of an export next to model_path made from its current contents in
+# this format version, or None
+def current_for(model_path):
+    path = compact_path(model_path)
+    if not os.path.exists(path):
+        return None
+    from evaluation_cache import file_hash
+    try:
+        meta = read_meta(path)
+    except (OSError, ValueError):
+        return None
+    if meta.get('format') != FORMAT or meta.get('version') != FORMAT_VERSION:
+        return None  # written by an older release; re-export
+    return path if meta.get('source', {}).get('sha256') == file_hash(model_path) else None
+
+
+def main(argv=None):
+    from scoring import DATA_PATH, MODEL_PATH, load_model
+
+    parser = argparse.ArgumentParser(description="Export and check compact cloudburst models.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help="write a pickled forest in the compact format")
+    export_parser.add_argument('--model', default=MODEL_PATH, help="pickled model to export")
+    export_parser.add_argument('-o', '--output', help="compact file to write (default: next to the model)")
+
+    check_parser = commands.add_parser('check', help="verify a compact model and time its load")
+    check_parser.add_argument('path')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        import pandas as pd
+        output = args.output or compact_path(args.model)
+        model = load_model(args.model)
+        meta = export(model, output, args.model)
+        reference = pd.read_csv(DATA_PATH)[meta['feature_names']]
+        identical = np.array_equal(load(output).predict_proba(reference), model.predict_proba(reference))
+        print(f"Exported {meta['n_estimators']} trees to {output} ({os.path.getsize(output) / 1024:.0f} KiB)")
+        print(f"Predictions identical to {os.path.basename(args.model)}: {identical}")
+        return
+
+    start = time.perf_counter()
+    forest = load(args.path)
+    seconds = time.perf_counter() - start
+    load(args.path, verify=True)
+    meta = read_meta(args.path)
+    print(f"{args.path}: {FORMAT} v{meta['version']}, {meta['n_estimators']} trees, "
+          f"{forest.node_count} nodes, features {', '.join(meta['feature_names'])}")
+    print(f"Schema and checksums OK; loaded in {seconds * 1000:.1f}ms")
+    if 'source' in meta:
+        print(f"Exported from {meta['source']['path']} (sha256 {meta['source']['sha256'][:12]})")
+    del forest
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+# Multi-core scoring of large archives.
+#
+# The input is split into shards of --chunksize rows and scored on a process
+# pool. Every worker loads the model once, in its initializer, and keeps it for
+# all of its shards. Columnar archives (see columnar.py) are opened by each
+# worker through the same memory-mapped files, so shards are passed as row
+# ranges and no feature data is pickled; CSV input is parsed in the parent and
+# shipped to the workers chunk by chunk, a few shards ahead of the pool.
+# Results are collected and written in input order.
+#
+#   python parallel_scoring.py history.cols -o scored.csv --workers 8
+#   python parallel_scoring.py history.csv --workers 4 --chunksize 200000
+#   python parallel_scoring.py history.cols --scaling      # 1, 2, 4, ... workers
+import argparse
+import os
+import time
+from collections import deque, namedtuple
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+import columnar
+from scoring import DEFAULT_CHUNKSIZE, MODEL_PATH, load_model, print_rejected, score_validated, scored_columns
+
+ParallelReport = namedtuple('ParallelReport', ['rows', 'chunks', 'disasters', 'seconds', 'workers', 'rejected'])
+
+# Per-process state set up by _init_worker
+_model = None
+_archive = None
+
+
+def _load(model_path):
+    model = load_model(model_path)
+    if hasattr(model, 'n_jobs'):
+        # The pool provides the parallelism; keep each forest single-threaded
+        model.n_jobs = 1
+    return model
+
+
+def _init_worker(model_path, archive_path):
+    global _model, _archive
+    _model = _load(model_path)
+    _archive = columnar.ColumnarDataset(archive_path) if archive_path else None
+
+
+# Output columns of a validated, scored block, plus the valid row count
+def _score(block):
+    checked, result = score_validated(_model, block)
+    return scored_columns(_model, checked, result), result.rows
+
+
+def _score_range(bounds):
+    start, stop = bounds
+    features = _model.feature_names_in_
+    return _score(np.column_stack([_archive.column(feature)[start:stop] for feature in features]))
+
+
+def _archive_for(path):
+    if columnar.is_columnar(path):
+        return columnar.ColumnarDataset(path)
+    return columnar.open_for(path)
+
+
+# Feature blocks (and the frames written to the output) of a CSV, in order
+def _csv_chunks(path, features, chunksize):
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [feature for feature in features if feature not in header]
+    if missing:
+        raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+    passthrough = ['time'] if 'time' in header else []
+    for chunk in pd.read_csv(path, usecols=passthrough + features, chunksize=chunksize):
+        yield chunk[passthrough + features]
+
+
+def score_parallel(path, output_path=None, workers=None, chunksize=DEFAULT_CHUNKSIZE,
+                   model_path=MODEL_PATH):
+    workers = workers or os.cpu_count()
+    features = list(load_model(model_path).feature_names_in_)
+    archive = _archive_for(path)
+    if archive is not None:
+        missing = [feature for feature in features if feature not in archive.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+
+    rows = chunks = disasters = rejected = 0
+    start = time.perf_counter()
+    with Pool(workers, _init_worker, (model_path, archive.path if archive else None)) as pool:
+        if archive is not None:
+            shards = (((offset, min(offset + chunksize, len(archive))),) * 2
+                      for offset in range(0, len(archive), chunksize))
+            results = _ordered(pool, _score_range, shards, 2 * workers)
+        else:
+            shards = ((chunk[features].to_numpy(), chunk) for chunk in _csv_chunks(path, features, chunksize))
+            results = _ordered(pool, _score, shards, 2 * workers)
+
+        for (columns, valid), context in results:
+            rows += valid
+            chunks += 1
+            disasters += int((columns['prediction'] == 1).sum())
+            rejected += len(columns['errors']) - valid
+            if output_path:
+                frame = _archive_frame(archive, features, *context) if archive is not None else context
+                frame.assign(**columns).to_csv(
+                    output_path, mode='w' if chunks == 1 else 'a', header=chunks == 1, index=False)
+    return ParallelReport(rows, chunks, disasters, time.perf_counter() - start, workers, rejected)
+
+
+# Run func over (item, context) pairs on the pool and yield (result, context)
+# in submission order, with at most `window` shards in flight so a large CSV
+# is never read far ahead of the workers
+def _ordered(pool, func, shards, window):
+    pending = deque()
+    for item, context in shards:
+        pending.append((pool.apply_async(func, (item,)), context))
+        if len(pending) >= window:
+            result, context = pending.popleft()
+            yield result.get(), context
+    while pending:
+        result, context = pending.popleft()
+        yield result.get(), context
+
+
+def _archive_frame(archive, features, start, stop):
+    frame = pd.DataFrame({feature: archive.column(feature)[start:stop] for feature in features})
+    if columnar.TIME_COLUMN in archive.columns:
+        times = archive.column(columnar.TIME_COLUMN)[start:stop]
+        frame.insert(0, columnar.TIME_COLUMN, times.view('datetime64[ns]'))
+    return frame
+
+
+def rows_per_sec(report):
+    return report.rows / report.seconds if report.seconds > 0 else float('inf')
+
+
+# Throughput at increasing worker counts, with speedup and efficiency
+# relative to a single worker
+def scaling(path, worker_counts, chunksize=DEFAULT_CHUNKSIZE, model_path=MODEL_PATH):
+    reports = [score_parallel(path, None, workers, chunksize, model_path) for workers in worker_counts]
+    base = reports[0].seconds * reports[0].workers
+    return [(report, base / report.seconds, base / report.seconds / report.workers) for report in reports]
+
+
+def format_report(report):
+    return (f"Scored {report.rows} rows in {report.seconds:.3f}s ({rows_per_sec(report):,.0f} rows/sec) "
+            f"with {report.workers} workers in {report.chunks} chunks")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a large dataset on a pool of worker processes.")
+    parser.add_argument('input', help="CSV file or columnar archive containing the model's feature columns")
+    parser.add_argument('-o', '--output', help="write scored rows to this CSV")
+    parser.add_argument('--model', default=MODEL_PATH, help="pickled model or compact .npz export")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="rows per shard")
+    parser.add_argument('--scaling', action='store_true',
+                        help="measure throughput at 1, 2, 4, ... up to --workers workers")
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count()
+    if args.scaling:
+        counts = [1]
+        while counts[-1] * 2 < args.workers:
+            counts.append(counts[-1] * 2)
+        if counts[-1] != args.workers:
+            counts.append(args.workers)
+        print(f"{'workers':>8} {'rows/sec':>12} {'speedup':>8} {'efficiency':>10}   ({cores} cores)")
+        for report, speedup, efficiency in scaling(args.input, counts, args.chunksize, args.model):
+            print(f"{report.workers:>8} {rows_per_sec(report):>12,.0f} {speedup:>8.2f} {efficiency:>10.0%}")
+        return
+
+    report = score_parallel(args.input, args.output, args.workers, args.chunksize, args.model)
+    print(format_report(report))
+    print(f"Predicted disasters: {report.disasters}")
+    print_rejected(report)
+    if report.workers > cores:
+        print(f"Note: {report.workers} workers share {cores} cores; use --scaling to find the best count")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# Memoized predictions for repeated sensor readings.
+#
+# The reading, in the model's feature order, is the cache key, and misses are
+# scored on the caller's exact values, so a cached answer is the one the
+# model would give. Entries live in an LRU of bounded size and expire after
+# a TTL.
+#
+# With `decimals` set, keys are rounded to that many decimals instead, so
+# readings that differ only below that precision share the answer scored
+# for the first of them (more hits, at the cost of exactness).
+#
+# The cache is bound to the model it was created with. An owner that swaps
+# models creates a new cache or calls set_model().
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from scoring import score_batch
+
+DEFAULT_MAXSIZE = 4096
+DEFAULT_TTL = 300.0
+
+
+class PredictionCache:
+    def __init__(self, model, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, decimals=None):
+        self.model = model
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.decimals = decimals
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def key(self, values):
+        if self.decimals is None:
+            return tuple(float(v) for v in values)
+        return tuple(round(float(v), self.decimals) for v in values)
+
+    def _lookup(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if now - stored_at > self.ttl:
+            del self.entries[key]
+            self.expired += 1
+            return None
+        self.entries.move_to_end(key)
+        return result
+
+    def _store(self, key, result, now):
+        self.entries[key] = (now, result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    # (prediction, probabilities) for each row; misses are scored in one batch
+    def predict_many(self, rows):
+        keys = [self.key(row) for row in rows]
+        results = [None] * len(keys)
+        now = time.monotonic()
+        with self.lock:
+            model = self.model
+            for i, key in enumerate(keys):
+                results[i] = self._lookup(key, now)
+        missing = [i for i, result in enumerate(results) if result is None]
+        hits = len(keys) - len(missing)
+
+        if missing:
+            # First row of every missing key, scored on its exact values
+            first = {}
+            for i in missing:
+                first.setdefault(keys[i], i)
+            scored = score_batch(model, np.array([rows[i] for i in first.values()], dtype=np.float64))
+            fresh = {key: (scored.predictions[j], scored.probabilities[j]) for j, key in enumerate(first)}
+            for i in missing:
+                results[i] = fresh[keys[i]]
+            with self.lock:
+                # A model swapped in meanwhile must not see the old answers
+                if self.model is model:
+                    for key, result in fresh.items():
+                        self._store(key, result, now)
+
+        with self.lock:
+            self.hits += hits
+            self.misses += len(missing)
+        return results
+
+    def predict(self, values):
+        return self.predict_many([values])[0]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    # Answer with another model from now on; the old answers are dropped
+    def set_model(self, model):
+        with self.lock:
+            self.model = model
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expired': self.expired,
+            }
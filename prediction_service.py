@@ -0,0 +1,265 @@
+# Local HTTP/JSON prediction service for the cloudburst model.
+#
+# Runs without tkinter. Requests that arrive within a few milliseconds of each
+# other are coalesced into a single forest pass by the MicroBatcher, and every
+# caller gets its own row of the result back.
+#
+#   python prediction_service.py --port 8000
+#
+#   POST /predict        {"temp": 24.1, "wspd": 9.0, "rhum": 96, "pres": 1009.8}
+#   POST /predict_proba  same body, or {"instances": [{...}, {...}]}
+#                        invalid instances get an "errors" list instead of a
+#                        result; a single invalid instance is a 400
+#   GET  /metrics        request/batch counters, queue depth, p50/p99 latency,
+#                        prediction cache hits/misses, stage latencies (--trace)
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import instrumentation
+from prediction_cache import DEFAULT_MAXSIZE, DEFAULT_TTL, PredictionCache
+from scoring import MODEL_PATH, load_model, score_batch
+from validation import describe, validate
+
+# How long the batcher waits for more requests after the first one arrives
+DEFAULT_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH = 1024
+# Number of recent request latencies kept for the percentiles
+LATENCY_WINDOW = 10_000
+
+
+class MicroBatcher:
+    def __init__(self, model, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH, cache=None):
+        self.model = model
+        self.cache = cache
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.batches = 0
+        self.lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self.thread.start()
+
+    # Queue one feature row; the future resolves to (prediction, probabilities)
+    def submit(self, row):
+        future = Future()
+        with self.lock:
+            if not self.running:
+                raise RuntimeError("The prediction batcher has stopped")
+            self.queue.put((row, future, time.perf_counter()))
+        return future
+
+    # Requests still queued when the batcher stops are failed, not left
+    # waiting on futures that would never resolve
+    def stop(self):
+        with self.lock:
+            self.running = False
+        self.queue.put(None)
+        self.thread.join()
+        stopped = RuntimeError("The prediction batcher stopped before scoring this request")
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(stopped)
+
+    def _collect(self):
+        first = self.queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self.running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while self.running:
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                results = self._score([row for row, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            done = time.perf_counter()
+            with self.lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.latencies.extend(done - submitted for _, _, submitted in batch)
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    # (prediction, probabilities) per row; cache hits skip the forest
+    def _score(self, rows):
+        if self.cache is not None:
+            return self.cache.predict_many(rows)
+        result = score_batch(self.model, np.array(rows))
+        return list(zip(result.predictions, result.probabilities))
+
+    def metrics(self):
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000.0
+            requests, batches = self.requests, self.batches
+        metrics = {
+            'requests': requests,
+            'batches': batches,
+            'mean_batch_size': requests / batches if batches else 0.0,
+            'queue_depth': self.queue.qsize(),
+            'latency_ms': {
+                'p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+                'p99': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            },
+        }
+        if self.cache is not None:
+            metrics['cache'] = self.cache.stats()
+        if instrumentation.enabled():
+            metrics['stages'] = instrumentation.snapshot()
+        return metrics
+
+
+# Validate a JSON body in one pass. Returns the validation result, whose
+# valid rows hold the feature values in the model's order, and whether the
+# body was a list of instances.
+def parse_instances(body, features):
+    instances = body.get('instances', [body]) if isinstance(body, dict) else None
+    if not isinstance(instances, list) or not instances:
+        raise ValueError("Expected a JSON object of features or {\"instances\": [...]}")
+    if not all(isinstance(instance, dict) for instance in instances):
+        raise ValueError("Each instance must be a JSON object")
+    return validate(instances, features), 'instances' in body
+
+
+def make_handler(batcher):
+    features = list(batcher.model.feature_names_in_)
+    classes = [int(c) for c in batcher.model.classes_]
+
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send(200, batcher.metrics())
+            else:
+                self._send(404, {'error': f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path not in ('/predict', '/predict_proba'):
+                self._send(404, {'error': f"Unknown path {self.path}"})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                checked, many = parse_instances(json.loads(self.rfile.read(length) or b'{}'), features)
+            except (ValueError, TypeError) as e:
+                self._send(400, {'error': str(e)})
+                return
+            if not many and not checked.valid[0]:
+                self._send(400, {'error': "Invalid instance", 'errors': describe(checked, 0)})
+                return
+            try:
+                futures = [batcher.submit(list(row)) if ok else None
+                           for row, ok in zip(checked.values, checked.valid)]
+                results = [future.result() if future else None for future in futures]
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+                return
+
+            outputs = []
+            for i, result in enumerate(results):
+                if result is None:
+                    outputs.append({'errors': describe(checked, i)})
+                elif self.path == '/predict':
+                    outputs.append({'prediction': int(result[0])})
+                else:
+                    outputs.append({'prediction': int(result[0]),
+                                    'probabilities': dict(zip(map(str, classes), map(float, result[1])))})
+            self._send(200, {'results': outputs} if many else outputs[0])
+
+        # Keep the console quiet under load
+        def log_message(self, format, *args):
+            pass
+
+    return PredictionHandler
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many concurrent sensor feeds connect at once
+    request_queue_size = 256
+
+
+def serve(model, host='127.0.0.1', port=8000, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH,
+          cache=None):
+    batcher = MicroBatcher(model, window_ms, max_batch, cache)
+    server = PredictionServer((host, port), make_handler(batcher))
+    return server, batcher
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve cloudburst predictions over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--model', default=MODEL_PATH, help="pickled model or compact .npz export")
+    parser.add_argument('--window-ms', type=float, default=DEFAULT_WINDOW_MS,
+                        help="how long to wait for more requests to batch together")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument('--fast', action='store_true', help="use the flattened forest engine")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAXSIZE,
+                        help="readings kept in the prediction cache (0 disables it)")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL,
+                        help="seconds a cached prediction stays valid")
+    parser.add_argument('--trace', action='store_true', help="report per-stage latencies on /metrics")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        instrumentation.enable()
+
+    model = load_model(args.model, args.fast)
+
+    cache = None
+    if args.cache_size > 0:
+        cache = PredictionCache(model, args.cache_size, args.cache_ttl)
+
+    server, batcher = serve(model, args.host, args.port, args.window_ms, args.max_batch, cache)
+    print(f"Serving predictions on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+# Streaming rolling-window features for live station feeds.
+#
+# Each station keeps a few ring buffers of (time, value) pairs with running
+# sums, so a new observation costs O(1) amortised work: it is appended,
+# observations that have left the window are evicted from the old end, and
+# the sums are adjusted. Nothing is recomputed over the history. A ring that
+# is full of readings still inside its window doubles in size, so fast feeds
+# never lose in-window readings.
+#
+# Features per observation (alongside the model's four inputs):
+#   prcp_3h, prcp_6h       precipitation summed over (t - 3h, t] and (t - 6h, t]
+#   pres_tendency_3h       pressure change since the reading 3h earlier (or the
+#                          oldest reading within the last 3h)
+#   dewpoint_depression    temp - dwpt; small values mean saturated air
+#   rhum_mean_3h           mean relative humidity over (t - 3h, t]
+#
+#   python rolling_features.py processed_disaster_data.csv -o features.csv
+#   python rolling_features.py feeds.csv --station-column station -o features.csv
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+HOUR = 3600.0
+# Initial ring size; at one reading a minute this covers 6h before growing
+DEFAULT_CAPACITY = 512
+
+FEATURES = ['prcp_3h', 'prcp_6h', 'pres_tendency_3h', 'dewpoint_depression', 'rhum_mean_3h']
+
+
+class RollingWindow:
+    def __init__(self, span, capacity=DEFAULT_CAPACITY, inclusive=False):
+        self.span = span
+        self.capacity = capacity
+        # Whether a reading exactly `span` old is still inside the window
+        self.inclusive = inclusive
+        self.times = [0.0] * capacity
+        self.values = [0.0] * capacity
+        self.head = 0
+        self.size = 0
+        self.sum = 0.0
+        self.count = 0  # non-NaN values in the window
+        self._pushes = 0
+
+    def push(self, t, value):
+        self.evict(t)
+        if self.size == self.capacity:
+            self._grow()
+        i = (self.head + self.size) % self.capacity
+        self.times[i] = t
+        self.values[i] = value
+        self.size += 1
+        if value == value:  # not NaN
+            self.sum += value
+            self.count += 1
+        # Re-add the window from scratch once per `capacity` pushes so the
+        # running sum cannot drift; amortised O(1)
+        self._pushes += 1
+        if self._pushes >= self.capacity:
+            self._pushes = 0
+            self._resum()
+
+    # Drop readings that have left the window as of time t
+    def evict(self, t):
+        cutoff = t - self.span
+        while self.size and (self.times[self.head] < cutoff if self.inclusive
+                             else self.times[self.head] <= cutoff):
+            self._pop()
+
+    # Double the ring, oldest reading first; only called when every reading
+    # in it is still inside the window
+    def _grow(self):
+        order = [(self.head + k) % self.capacity for k in range(self.size)]
+        self.times = [self.times[i] for i in order] + [0.0] * self.capacity
+        self.values = [self.values[i] for i in order] + [0.0] * self.capacity
+        self.head = 0
+        self.capacity *= 2
+
+    def _pop(self):
+        value = self.values[self.head]
+        if value == value:
+            self.sum -= value
+            self.count -= 1
+        self.head = (self.head + 1) % self.capacity
+        self.size -= 1
+        if not self.count:
+            self.sum = 0.0
+
+    def _resum(self):
+        valid = [self.values[(self.head + k) % self.capacity] for k in range(self.size)]
+        valid = [v for v in valid if v == v]
+        self.sum = math.fsum(valid)
+        self.count = len(valid)
+
+    def total(self):
+        return self.sum if self.count else math.nan
+
+    def mean(self):
+        return self.sum / self.count if self.count else math.nan
+
+    def oldest(self):
+        return self.values[self.head] if self.size else math.nan
+
+
+class StationFeatures:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.prcp_3h = RollingWindow(3 * HOUR, capacity)
+        self.prcp_6h = RollingWindow(6 * HOUR, capacity)
+        self.rhum_3h = RollingWindow(3 * HOUR, capacity)
+        # Keeps the reading exactly 3h old, the standard tendency reference
+        self.pres_3h = RollingWindow(3 * HOUR, capacity, inclusive=True)
+        self.last_time = -math.inf
+
+    # Fold one observation in and return its rolling features
+    def update(self, t, temp, dwpt, rhum, prcp, pres):
+        if t < self.last_time:
+            raise ValueError(f"Observation at {t} is older than the last one at {self.last_time}")
+        self.last_time = t
+        self.prcp_3h.push(t, prcp)
+        self.prcp_6h.push(t, prcp)
+        self.rhum_3h.push(t, rhum)
+        self.pres_3h.push(t, pres)
+        return {
+            'prcp_3h': self.prcp_3h.total(),
+            'prcp_6h': self.prcp_6h.total(),
+            'pres_tendency_3h': pres - self.pres_3h.oldest(),
+            'dewpoint_depression': temp - dwpt,
+            'rhum_mean_3h': self.rhum_3h.mean(),
+        }
+
+
+def epoch_seconds(t):
+    if isinstance(t, (int, float)):
+        return float(t)
+    return pd.Timestamp(t).value / 1e9
+
+
+class FeatureEngine:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.stations = {}
+        self.observations = 0
+
+    def station(self, station):
+        state = self.stations.get(station)
+        if state is None:
+            state = self.stations[station] = StationFeatures(self.capacity)
+        return state
+
+    # Rolling features for one observation; `observation` maps column names
+    # (temp, dwpt, rhum, prcp, pres, ...) to values and `t` is a timestamp
+    # or epoch seconds
+    def update(self, station, t, observation):
+        self.observations += 1
+        get = observation.get
+        return self.station(station).update(
+            epoch_seconds(t), float(get('temp', math.nan)), float(get('dwpt', math.nan)),
+            float(get('rhum', math.nan)), float(get('prcp', math.nan)), float(get('pres', math.nan)))
+
+
+# Run the engine over a frame in time order (per station when a station column
+# is given) and return the rolling features as columns aligned with it
+def rolling_frame(data, station_column=None, time_column='time', capacity=DEFAULT_CAPACITY):
+    engine = FeatureEngine(capacity)
+    times = pd.to_datetime(data[time_column]).to_numpy('datetime64[ns]').view(np.int64) / 1e9
+    stations = data[station_column].to_numpy() if station_column else np.zeros(len(data), dtype=int)
+    columns = {name: data[name].to_numpy(dtype=np.float64) if name in data else np.full(len(data), np.nan)
+               for name in ('temp', 'dwpt', 'rhum', 'prcp', 'pres')}
+    out = np.empty((len(data), len(FEATURES)))
+    # Stable sort keeps the file order for equal timestamps
+    for i in np.argsort(times, kind='stable'):
+        engine.observations += 1
+        features = engine.station(stations[i]).update(
+            times[i], columns['temp'][i], columns['dwpt'][i], columns['rhum'][i],
+            columns['prcp'][i], columns['pres'][i])
+        out[i] = [features[name] for name in FEATURES]
+    return pd.DataFrame(out, columns=FEATURES, index=data.index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute rolling-window features for weather observations.")
+    parser.add_argument('input', help="CSV with time, temp, dwpt, rhum, prcp and pres columns")
+    parser.add_argument('-o', '--output', help="write the observations with their features to this CSV")
+    parser.add_argument('--station-column', help="column identifying the station of each row")
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY,
+                        help="initial observations a window holds per station; grows as needed")
+    args = parser.parse_args(argv)
+
+    data = pd.read_csv(args.input)
+    start = time.perf_counter()
+    features = rolling_frame(data, args.station_column, capacity=args.capacity)
+    seconds = time.perf_counter() - start
+    print(f"Computed {len(FEATURES)} rolling features for {len(data)} rows in {seconds:.3f}s "
+          f"({len(data) / seconds if seconds > 0 else float('inf'):,.0f} rows/sec)")
+    if args.output:
+        pd.concat([data, features], axis=1).to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
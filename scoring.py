@@ -0,0 +1,283 @@
+# Headless scoring engine for the cloudburst model.
+#
+# Importing this module has no GUI side effects: nothing is loaded until a
+# function is called. Whole batches go through a single predict_proba call
+# and every scoring call reports its throughput in rows/sec. Files are
+# validated first (see validation.py); rejected rows are written out without
+# a prediction and with their problems in the `errors` column.
+#
+#   python scoring.py observations.csv -o scored.csv
+#   python scoring.py archive.csv -o scored.csv --chunksize 200000
+#   python scoring.py archive.cols -o scored.csv
+#
+# A columnar archive (see columnar.py) can be scored directly, and a CSV with
+# an up-to-date archive next to it is read from the archive instead. --model
+# also accepts a compact export (see model_format.py), but files are batch
+# work and sklearn scores large batches faster than the flattened forest.
+import argparse
+import hashlib
+import io
+import os
+import pickle
+import time
+import warnings
+import weakref
+from collections import namedtuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import columnar
+import instrumentation
+import model_format
+from instrumentation import action, stage
+from validation import describe, validate
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(script_dir, 'refined_disaster_prediction_model.pkl')
+DATA_PATH = os.path.join(script_dir, 'processed_disaster_data.csv')
+
+# Rows read per chunk in streaming mode
+DEFAULT_CHUNKSIZE = 100_000
+
+ScoreResult = namedtuple('ScoreResult', ['predictions', 'probabilities', 'rows', 'seconds', 'rejected'],
+                         defaults=(0,))
+StreamReport = namedtuple('StreamReport', ['rows', 'chunks', 'disasters', 'seconds', 'rejected'],
+                          defaults=(0,))
+
+
+def rows_per_sec(result):
+    return result.rows / result.seconds if result.seconds > 0 else float('inf')
+
+
+# SHA-256 of the file every loaded model was read from. Caches of results
+# derived from a model (evaluation, calibration) key on this, so a model
+# keeps its own key after a newer file is published over it.
+_model_hashes = weakref.WeakKeyDictionary()
+
+
+# Cache key of a model: the hash of the bytes it was loaded from, or of its
+# pickle when it was not loaded by load_model (e.g. just trained)
+def model_hash(model):
+    digest = _model_hashes.get(model)
+    if digest is None:
+        digest = hashlib.sha256(pickle.dumps(model)).hexdigest()
+    return digest
+
+
+# Load the model from disk. A compact export is memory-mapped and is already
+# a FlatForest; with fast set, a pickled forest is flattened (or its current
+# export loaded instead). The flattened forest only pays off on small
+# batches (single readings, the prediction service).
+def load_model(path=MODEL_PATH, fast=False):
+    with stage("model load"):
+        if fast and not model_format.is_compact(path):
+            path = model_format.current_for(path) or path
+        if model_format.is_compact(path):
+            model = model_format.load(path)
+            _model_hashes[model] = model.source_sha256
+            return model
+        # The file is read once, so the bytes hashed are the bytes unpickled
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        # Models pickled by another sklearn version still load; the
+        # version warning is silenced here only, not process-wide
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            model = joblib.load(io.BytesIO(data))
+    if fast:
+        from fast_forest import FlatForest
+        model = FlatForest.from_sklearn(model)
+    _model_hashes[model] = digest
+    return model
+
+
+# Build the feature frame the model expects from a DataFrame or a 2-D array
+def prepare_features(model, data):
+    features = list(model.feature_names_in_)
+    if isinstance(data, pd.DataFrame):
+        missing = [feature for feature in features if feature not in data.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+        return data[features]
+    values = np.asarray(data, dtype=np.float64)
+    if values.ndim == 1:
+        values = values.reshape(1, -1)
+    if values.ndim != 2 or values.shape[1] != len(features):
+        raise ValueError(f"Expected an array of shape (n, {len(features)}), got {values.shape}")
+    return pd.DataFrame(values, columns=features)
+
+
+# Score a whole batch with one forest pass. Labels are derived from the
+# probabilities exactly as RandomForestClassifier.predict does, so the trees
+# are only walked once per batch.
+def score_batch(model, data):
+    with stage("feature frame"):
+        X = prepare_features(model, data)
+    start = time.perf_counter()
+    if len(X):
+        with stage("inference"), warnings.catch_warnings():
+            # Arrays carry no feature names; they are in the model's order
+            warnings.simplefilter('ignore', UserWarning)
+            probabilities = model.predict_proba(X)
+        predictions = model.classes_.take(np.argmax(probabilities, axis=1), axis=0)
+    else:
+        probabilities = np.empty((0, len(model.classes_)))
+        predictions = np.empty(0, dtype=model.classes_.dtype)
+    seconds = time.perf_counter() - start
+    return ScoreResult(predictions, probabilities, len(X), seconds)
+
+
+# Probability of the positive (disaster) class for each row
+def disaster_probability(model, probabilities):
+    return probabilities[:, list(model.classes_).index(1)]
+
+
+# Validate a batch and score the rows that pass. Returns the validation
+# result and the ScoreResult of the valid rows.
+def score_validated(model, data):
+    with stage("validation"):
+        checked = validate(data, list(model.feature_names_in_))
+    result = score_batch(model, checked.values[checked.valid])
+    return checked, result._replace(rejected=int(np.count_nonzero(~checked.valid)))
+
+
+# Output columns for every row of a validated batch: rejected rows get no
+# prediction or probability and list their problems in `errors`
+def scored_columns(model, checked, result):
+    n = len(checked.valid)
+    predictions = pd.array(np.zeros(n, dtype=np.int64), dtype='Int64')
+    predictions[~checked.valid] = pd.NA
+    predictions[checked.valid] = result.predictions
+    probability = np.full(n, np.nan)
+    probability[checked.valid] = disaster_probability(model, result.probabilities)
+    errors = np.full(n, '', dtype=object)
+    for row in np.flatnonzero(~checked.valid):
+        errors[row] = '; '.join(describe(checked, row))
+    return {'prediction': predictions, 'disaster_probability': probability, 'errors': errors}
+
+
+# Score every row of a CSV and optionally write the scored rows back out
+def score_csv(model, path, output_path=None):
+    with stage("data load"):
+        data = pd.read_csv(path)
+    checked, result = score_validated(model, data)
+    if output_path:
+        data.assign(**scored_columns(model, checked, result)).to_csv(output_path, index=False)
+    return result
+
+
+# Stream a CSV of any size through the forest in fixed-size chunks. Only the
+# time column (when present) and the model's feature columns are parsed, and
+# each scored chunk is appended to output_path before the next one is read,
+# so peak memory depends on chunksize rather than on the size of the file.
+def score_csv_streaming(model, path, output_path=None, chunksize=DEFAULT_CHUNKSIZE):
+    features = list(model.feature_names_in_)
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [feature for feature in features if feature not in header]
+    if missing:
+        raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+    passthrough = ['time'] if 'time' in header else []
+
+    rows = chunks = disasters = rejected = 0
+    start = time.perf_counter()
+    for chunk in pd.read_csv(path, usecols=passthrough + features, chunksize=chunksize):
+        checked, result = score_validated(model, chunk)
+        rows += result.rows
+        chunks += 1
+        disasters += int(np.sum(result.predictions == 1))
+        rejected += result.rejected
+        if output_path:
+            scored = chunk[passthrough + features].assign(**scored_columns(model, checked, result))
+            scored.to_csv(output_path, mode='w' if chunks == 1 else 'a',
+                          header=chunks == 1, index=False)
+    return StreamReport(rows, chunks, disasters, time.perf_counter() - start, rejected)
+
+
+# Score a columnar archive block by block. Only the model's feature columns
+# (and time, when writing output) are read from the memory-mapped files.
+def score_columnar(model, archive, output_path=None, chunksize=DEFAULT_CHUNKSIZE):
+    features = list(model.feature_names_in_)
+    missing = [feature for feature in features if feature not in archive.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+    columns = [archive.column(feature) for feature in features]
+    has_time = columnar.TIME_COLUMN in archive.columns
+
+    rows = chunks = disasters = rejected = 0
+    start = time.perf_counter()
+    for offset in range(0, len(archive), chunksize):
+        block = np.column_stack([column[offset:offset + chunksize] for column in columns])
+        checked, result = score_validated(model, block)
+        rows += result.rows
+        chunks += 1
+        disasters += int(np.sum(result.predictions == 1))
+        rejected += result.rejected
+        if output_path:
+            scored = pd.DataFrame(block, columns=features).assign(**scored_columns(model, checked, result))
+            if has_time:
+                times = archive.column(columnar.TIME_COLUMN)[offset:offset + len(block)]
+                scored.insert(0, columnar.TIME_COLUMN, times.view('datetime64[ns]'))
+            scored.to_csv(output_path, mode='w' if chunks == 1 else 'a',
+                          header=chunks == 1, index=False)
+    return StreamReport(rows, chunks, disasters, time.perf_counter() - start, rejected)
+
+
+def format_report(result):
+    return f"Scored {result.rows} rows in {result.seconds:.3f}s ({rows_per_sec(result):,.0f} rows/sec)"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score weather observations with the cloudburst model.")
+    parser.add_argument('input', help="CSV file or columnar archive containing the model's feature columns")
+    parser.add_argument('-o', '--output', help="write scored rows to this CSV")
+    parser.add_argument('--model', default=MODEL_PATH, help="pickled model or compact .npz export")
+    parser.add_argument('--chunksize', type=int,
+                        help="stream the input in chunks of this many rows (bounded memory)")
+    parser.add_argument('--trace', action='store_true', help="print per-stage latency statistics")
+    parser.add_argument('--trace-output', help="also write the statistics to this JSON file")
+    parser.add_argument('--profile', choices=instrumentation.PROFILERS,
+                        help="profile the run into .cache/profiles/")
+    args = parser.parse_args(argv)
+
+    if args.trace or args.trace_output or args.profile:
+        instrumentation.enable(args.profile)
+    with action("score"):
+        run(args)
+    if instrumentation.enabled():
+        print(instrumentation.format_table())
+        if args.trace_output:
+            instrumentation.export(args.trace_output)
+
+
+def run(args):
+    model = load_model(args.model)
+    archive = (columnar.ColumnarDataset(args.input) if columnar.is_columnar(args.input)
+               else columnar.open_for(args.input))
+    if archive is not None:
+        report = score_columnar(model, archive, args.output, args.chunksize or DEFAULT_CHUNKSIZE)
+        print(f"{format_report(report)} from {archive.path}")
+        print(f"Predicted disasters: {report.disasters}")
+        print_rejected(report)
+        return
+    if args.chunksize:
+        report = score_csv_streaming(model, args.input, args.output, args.chunksize)
+        print(f"{format_report(report)} in {report.chunks} chunks")
+        print(f"Predicted disasters: {report.disasters}")
+        print_rejected(report)
+        return
+    result = score_csv(model, args.input, args.output)
+    print(format_report(result))
+    print(f"Predicted disasters: {int(np.sum(result.predictions == 1))}")
+    print_rejected(result)
+
+
+def print_rejected(result):
+    if result.rejected:
+        print(f"Rejected by validation: {result.rejected} rows (see the errors column)")
+
+
+if __name__ == '__main__':
+    main()
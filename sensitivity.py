@@ -0,0 +1,222 @@
+# What-if sensitivity sweeps around a set of inputs.
+#
+# Each feature gets an axis of `steps` values spanning center ± span (two
+# standard deviations of the dataset by default, clipped to the physically
+# possible range), and the full Cartesian grid of those axes is scored:
+# 32 steps over four features is 1,048,576 points. The grid is built with
+# index arithmetic, split into blocks of 65,536 points and scored on a thread
+# pool with the model's own predict_proba. Blocks that size are where
+# sklearn's compiled tree walk is about twice as fast as the flattened
+# forest, so the sweep takes the pickled model; a FlatForest passed in is
+# used as is. Both walks release the GIL, so blocks run on all cores without
+# copying anything to other processes.
+#
+# Sweeps are cached per input tuple in a small LRU bound to the engine's
+# model, so revisiting the views is free; a new model gets a new engine.
+# Summaries of a sweep:
+#   partial_dependence   mean risk along each axis, averaged over the others
+#   center_slice         risk along each axis with the others at the inputs
+#   pair_map             mean risk over two axes, averaged over the rest
+#
+#   python sensitivity.py --inputs 26 5 98 1000 --steps 32
+#   python sensitivity.py --inputs 26 5 98 1000 --steps 32 --workers 4 --png sweep.png
+import argparse
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scoring import DATA_PATH, MODEL_PATH, disaster_probability, load_model
+from validation import BOUNDS
+
+DEFAULT_STEPS = 32
+# Half-width of each axis in dataset standard deviations
+DEFAULT_SPAN_STDS = 2.0
+DEFAULT_MAXSIZE = 8
+# Grid points per scoring task
+BLOCK_POINTS = 65_536
+
+# axes: one 1-D array per feature; risk: array of shape (steps,) * features
+Sweep = namedtuple('Sweep', ['features', 'center', 'axes', 'risk', 'seconds'])
+
+
+# Axis values for each feature: center ± span, cut at BOUNDS (so an axis
+# near a limit is one-sided rather than repeating the limit), always
+# containing the center itself. A center outside BOUNDS is moved to the
+# nearest limit first, so the axis never runs backwards.
+def sweep_axes(features, center, spans, steps=DEFAULT_STEPS):
+    axes = []
+    for feature, value, span in zip(features, center, spans):
+        low, high = BOUNDS.get(feature, (-np.inf, np.inf))
+        value = min(max(value, low), high)
+        axis = np.linspace(max(value - span, low), min(value + span, high), steps)
+        axis[np.argmin(np.abs(axis - value))] = value
+        axes.append(axis)
+    return axes
+
+
+# Index of the center value on every axis
+def center_index(sweep):
+    return tuple(int(np.argmin(np.abs(axis - value))) for axis, value in zip(sweep.axes, sweep.center))
+
+
+# Grid points start..stop as a frame in the model's feature order; both
+# engines compare in float32, so the points are rounded to it once here
+def _grid_block(features, axes, start, stop):
+    shape = tuple(len(axis) for axis in axes)
+    index = np.unravel_index(np.arange(start, stop), shape)
+    block = np.column_stack([axis[i] for axis, i in zip(axes, index)]).astype(np.float32)
+    return pd.DataFrame(block, columns=features, copy=False)
+
+
+# Score the full Cartesian grid of the axes, block by block on `workers` threads
+def score_grid(model, axes, workers=None, block_points=BLOCK_POINTS):
+    features = list(model.feature_names_in_)
+    total = int(np.prod([len(axis) for axis in axes]))
+    risk = np.empty(total, dtype=np.float64)
+
+    def score(start):
+        stop = min(start + block_points, total)
+        block = _grid_block(features, axes, start, stop)
+        risk[start:stop] = disaster_probability(model, model.predict_proba(block))
+
+    starts = range(0, total, block_points)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(starts) == 1:
+        for start in starts:
+            score(start)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sweep") as pool:
+            list(pool.map(score, starts))
+    return risk.reshape(tuple(len(axis) for axis in axes))
+
+
+# Sweeps of one model. Inputs are keyed exactly unless decimals is given, in
+# which case nearby inputs share one sweep centered on the rounded values.
+class SensitivityEngine:
+    def __init__(self, model, spans, steps=DEFAULT_STEPS, workers=None,
+                 maxsize=DEFAULT_MAXSIZE, decimals=None):
+        self.model = model
+        self.features = list(model.feature_names_in_)
+        self.spans = [float(span) for span in spans]
+        self.steps = steps
+        self.workers = workers
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.entries = OrderedDict()
+        # Held while sweeping, so a view asking for the sweep another view is
+        # computing waits for it instead of computing it again
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, center):
+        if self.decimals is None:
+            return tuple(float(v) for v in center)
+        return tuple(round(float(v), self.decimals) for v in center)
+
+    def sweep(self, center):
+        key = self.key(center)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            start = time.perf_counter()
+            axes = sweep_axes(self.features, key, self.spans, self.steps)
+            risk = score_grid(self.model, axes, self.workers)
+            result = Sweep(self.features, key, axes, risk, time.perf_counter() - start)
+            self.entries[key] = result
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+            return result
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+# Default spans from the dataset's standard deviations
+def dataset_spans(store, features, stds=DEFAULT_SPAN_STDS):
+    return [float(store.stats.loc[feature, 'std']) * stds for feature in features]
+
+
+# Mean risk along each axis, averaged over all the others
+def partial_dependence(sweep, values=None):
+    values = sweep.risk if values is None else values
+    return [values.mean(axis=tuple(a for a in range(values.ndim) if a != f)) for f in range(values.ndim)]
+
+
+# Risk along each axis with every other feature held at its input value
+def center_slice(sweep, values=None):
+    values = sweep.risk if values is None else values
+    index = center_index(sweep)
+    return [values[index[:f] + (slice(None),) + index[f + 1:]] for f in range(values.ndim)]
+
+
+# Mean risk over axes i and j, averaged over the rest: shape (len_i, len_j)
+def pair_map(sweep, i, j, values=None):
+    values = sweep.risk if values is None else values
+    return values.mean(axis=tuple(a for a in range(values.ndim) if a not in (i, j)))
+
+
+def feature_pairs(features):
+    return list(itertools.combinations(range(len(features)), 2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep every feature around a set of inputs and score the grid.")
+    parser.add_argument('--inputs', type=float, nargs='+', required=True,
+                        help="center values, in the model's feature order")
+    parser.add_argument('--steps', type=int, default=DEFAULT_STEPS, help="values per feature axis")
+    parser.add_argument('--span-stds', type=float, default=DEFAULT_SPAN_STDS,
+                        help="half-width of each axis in dataset standard deviations")
+    parser.add_argument('--workers', type=int, help="scoring threads (default: all cores)")
+    parser.add_argument('--model', default=MODEL_PATH, help="pickled model or compact .npz export")
+    parser.add_argument('--png', help="plot the partial-dependence curves to this image")
+    args = parser.parse_args(argv)
+
+    from dataset_store import get_store
+    model = load_model(args.model)
+    features = list(model.feature_names_in_)
+    if len(args.inputs) != len(features):
+        parser.error(f"--inputs needs {len(features)} values: {', '.join(features)}")
+    spans = dataset_spans(get_store(DATA_PATH), features, args.span_stds)
+    engine = SensitivityEngine(model, spans, args.steps, args.workers)
+
+    sweep = engine.sweep(args.inputs)
+    points = sweep.risk.size
+    print(f"Scored {points:,} grid points in {sweep.seconds:.3f}s ({points / sweep.seconds:,.0f} points/sec)")
+    start = time.perf_counter()
+    engine.sweep(args.inputs)
+    print(f"Cached sweep returned in {(time.perf_counter() - start) * 1000:.2f}ms")
+    print(f"Risk at the inputs: {sweep.risk[center_index(sweep)]:.3f}")
+    for feature, axis, curve in zip(features, sweep.axes, partial_dependence(sweep)):
+        print(f"  {feature:>5} {axis[0]:>8.1f} .. {axis[-1]:<8.1f} mean risk {curve.min():.3f} .. {curve.max():.3f}")
+
+    if args.png:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure(figsize=(10, 7))
+        FigureCanvasAgg(fig)
+        for ax, feature, axis, mean, line, value in zip(fig.subplots(2, 2).ravel(), features, sweep.axes,
+                                                        partial_dependence(sweep), center_slice(sweep),
+                                                        sweep.center):
+            ax.plot(axis, mean, label="partial dependence")
+            ax.plot(axis, line, label="others at inputs")
+            ax.axvline(value, linestyle='--', color='gray')
+            ax.set_xlabel(feature)
+            ax.set_ylim(-0.02, 1.02)
+            ax.legend()
+        fig.tight_layout()
+        fig.savefig(args.png, dpi=100)
+
+
+if __name__ == '__main__':
+    main()
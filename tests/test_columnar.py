@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import columnar
+
+
+def write_csv(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_round_trip_matches_pandas(tmp_path):
+    csv = write_csv(tmp_path / 'data.csv',
+                    "time,temp,coco,rhum\n"
+                    "2024-01-01 00:00,21.5,3,80\n"
+                    "2024-01-01 01:00,22.0,4,81\n"
+                    "2024-01-01 02:00,22.5,3,79\n")
+    archive = columnar.convert(csv)
+    expected = pd.read_csv(csv)
+    assert len(archive) == len(expected)
+    assert archive.column('coco').dtype == np.int64
+    assert np.array_equal(archive.column('coco'), expected['coco'])
+    assert np.allclose(archive.column('temp'), expected['temp'])
+    assert archive.time.equals(pd.DatetimeIndex(pd.to_datetime(expected['time']), name='time'))
+    assert archive.matches(csv)
+    assert columnar.open_for(csv) is not None
+
+
+# A column that is whole numbers in the first chunk and has fractions or
+# blanks in a later one is promoted to float, keeping the earlier values
+def test_int_column_promoted_to_float(tmp_path):
+    lines = ["time,prcp"] + [f"2024-01-01 {h:02d}:00,{h}" for h in range(6)]
+    lines += ["2024-01-01 06:00,96.7", "2024-01-01 07:00,"]
+    csv = write_csv(tmp_path / 'data.csv', "\n".join(lines) + "\n")
+    archive = columnar.convert(csv, chunksize=3)
+    prcp = archive.column('prcp')
+    assert prcp.dtype == np.float32
+    assert np.array_equal(prcp[:6], np.arange(6))
+    assert prcp[6] == np.float32(96.7)
+    assert np.isnan(prcp[7])
+
+
+def test_blank_lines_are_not_rows(tmp_path):
+    csv = write_csv(tmp_path / 'data.csv', "time,temp\n2024-01-01 00:00,1\n\n  \n2024-01-01 01:00,2\n\n")
+    assert columnar._count_rows(csv) == len(pd.read_csv(csv)) == 2
+    assert len(columnar.convert(csv)) == 2
+
+
+def test_non_numeric_value_rejected(tmp_path):
+    csv = write_csv(tmp_path / 'data.csv', "time,temp\n2024-01-01 00:00,1\n2024-01-01 01:00,warm\n")
+    with pytest.raises(ValueError, match="row 2"):
+        columnar.convert(csv)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from fast_forest import FlatForest
+from scoring import DATA_PATH, MODEL_PATH, load_model
+
+FEATURES = ['temp', 'wspd', 'rhum', 'pres']
+
+
+@pytest.fixture(scope='module')
+def model():
+    return load_model(MODEL_PATH)
+
+
+@pytest.fixture(scope='module')
+def reference():
+    return pd.read_csv(DATA_PATH)[FEATURES]
+
+
+def test_reference_data_identical(model, reference):
+    forest = FlatForest.from_sklearn(model)
+    assert np.array_equal(forest.predict_proba(reference), model.predict_proba(reference))
+    assert np.array_equal(forest.predict(reference), model.predict(reference))
+
+
+def test_synthetic_rows_identical(model, reference):
+    rng = np.random.default_rng(0)
+    low, high = reference.min().to_numpy(), reference.max().to_numpy()
+    X = pd.DataFrame(rng.uniform(low, high, size=(5000, len(FEATURES))), columns=FEATURES)
+    forest = FlatForest.from_sklearn(model)
+    assert np.array_equal(forest.predict_proba(X), model.predict_proba(X))
+
+
+# Rows sitting exactly on split thresholds take the same branch as in sklearn
+def test_values_on_thresholds_identical(model):
+    forest = FlatForest.from_sklearn(model)
+    internal = forest.left != -1
+    columns = []
+    for f in range(len(FEATURES)):
+        thresholds = forest.threshold[internal & (forest.feature == f)]
+        columns.append(np.resize(thresholds, 2000))
+    X = pd.DataFrame(np.column_stack(columns), columns=FEATURES)
+    assert np.array_equal(forest.predict_proba(X), model.predict_proba(X))
+
+
+def test_apply_matches_sklearn(model, reference):
+    forest = FlatForest.from_sklearn(model)
+    offsets = np.cumsum([0] + [e.tree_.node_count for e in model.estimators_[:-1]])
+    expected = model.apply(reference).T + offsets[:, np.newaxis]
+    assert np.array_equal(forest.apply(reference), expected)
+
+
+# Random labels force deep, irregular trees over three classes
+def test_deep_noisy_multiclass_forest_identical():
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(3000, 4)).round(2), columns=FEATURES)
+    y = rng.integers(0, 3, len(X))
+    noisy = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    forest = FlatForest.from_sklearn(noisy)
+    assert max(e.tree_.max_depth for e in noisy.estimators_) > 20
+    test = pd.DataFrame(rng.normal(size=(4000, 4)), columns=FEATURES)
+    assert np.array_equal(forest.predict_proba(test), noisy.predict_proba(test))
+    assert np.array_equal(forest.predict_proba(X), noisy.predict_proba(X))
+
+
+def test_single_row_and_empty_batch(model, reference):
+    forest = FlatForest.from_sklearn(model)
+    row = reference.iloc[:1]
+    assert np.array_equal(forest.predict_proba(row), model.predict_proba(row))
+    assert forest.predict_proba(np.empty((0, len(FEATURES)))).shape == (0, 2)
+
+
+def test_rejects_non_finite_rows(model):
+    forest = FlatForest.from_sklearn(model)
+    with pytest.raises(ValueError):
+        forest.predict_proba(np.array([[np.nan, 1.0, 50.0, 1000.0]]))
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from rolling_features import HOUR, RollingWindow, rolling_frame
+
+
+def readings(n, seconds_apart, seed=0):
+    rng = np.random.default_rng(seed)
+    time = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.cumsum(rng.integers(1, 2 * seconds_apart, n)), unit='s')
+    prcp = rng.uniform(0.0, 2.0, n)
+    prcp[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({'time': time, 'temp': rng.uniform(15, 30, n), 'dwpt': rng.uniform(10, 20, n),
+                         'rhum': rng.uniform(40, 100, n), 'prcp': prcp, 'pres': rng.uniform(990, 1020, n)})
+
+
+def test_window_matches_pandas_time_rolling():
+    data = readings(5000, 60)
+    window = RollingWindow(3 * HOUR, capacity=4)
+    times = data['time'].to_numpy('datetime64[ns]').view(np.int64) / 1e9
+    sums, means = [], []
+    for t, value in zip(times, data['prcp']):
+        window.push(t, value)
+        sums.append(window.total())
+        means.append(window.mean())
+    rolling = data.set_index('time')['prcp'].rolling('3h')
+    expected_sum = rolling.sum().to_numpy(copy=True)
+    # pandas sums an all-NaN window to 0; the window reports NaN
+    expected_sum[rolling.count().to_numpy() == 0] = np.nan
+    assert np.allclose(sums, expected_sum, equal_nan=True)
+    assert np.allclose(means, rolling.mean().to_numpy(), equal_nan=True)
+
+
+# At one reading a second the 6h window holds 21,600 readings, far more
+# than the initial ring
+def test_fast_feed_keeps_every_reading_in_window():
+    data = readings(30000, 1, seed=1).fillna({'prcp': 0.0})
+    features = rolling_frame(data, capacity=8)
+    indexed = data.set_index('time')
+    assert np.allclose(features['prcp_3h'], indexed['prcp'].rolling('3h').sum().to_numpy())
+    assert np.allclose(features['prcp_6h'], indexed['prcp'].rolling('6h').sum().to_numpy())
+    assert np.allclose(features['rhum_mean_3h'], indexed['rhum'].rolling('3h').mean().to_numpy())
+
+
+def test_pressure_tendency_uses_reading_three_hours_old():
+    time = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.arange(7), unit='h')
+    data = pd.DataFrame({'time': time, 'pres': [1000.0, 1001, 1003, 1006, 1010, 1015, 1021]})
+    features = rolling_frame(data)
+    assert features['pres_tendency_3h'].tolist() == [0.0, 1.0, 3.0, 6.0, 9.0, 12.0, 15.0]
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from validation import FEATURES, MISSING, NOT_FINITE, NOT_NUMERIC, OUT_OF_RANGE, describe, validate
+
+
+def test_masks_flag_each_bad_cell():
+    frame = pd.DataFrame({
+        'temp': [25.0, None, 'hot', 25.0, 25.0],
+        'wspd': [5.0, 5.0, 5.0, float('inf'), 5.0],
+        'rhum': [90.0, 90.0, 90.0, 90.0, 120.0],
+        'pres': [1000.0, 1000.0, 1000.0, 1000.0, 1000.0],
+    })
+    result = validate(frame)
+    assert result.valid.tolist() == [True, False, False, False, False]
+    expected = np.zeros((5, 4), dtype=np.uint8)
+    expected[1, 0] = MISSING
+    expected[2, 0] = NOT_NUMERIC
+    expected[3, 1] = NOT_FINITE
+    expected[4, 2] = OUT_OF_RANGE
+    assert np.array_equal(result.errors, expected)
+    # Invalid cells are NaN, valid ones keep their values
+    assert np.isnan(result.values[result.errors != 0]).all()
+    assert np.array_equal(result.values[0], [25.0, 5.0, 90.0, 1000.0])
+
+
+def test_missing_feature_column_flags_every_row():
+    result = validate([{'temp': 25, 'wspd': 5, 'rhum': 90}, {'temp': 26, 'wspd': 4, 'rhum': 91}])
+    assert not result.valid.any()
+    assert (result.errors[:, FEATURES.index('pres')] == MISSING).all()
+
+
+def test_array_input_and_bounds_are_inclusive():
+    result = validate(np.array([[-90.0, 0.0, 100.0, 1085.0], [60.0, 410.0, 0.0, 870.0]]))
+    assert result.valid.all()
+
+
+def test_describe_names_the_problem():
+    result = validate({'temp': 25, 'wspd': 5, 'rhum': 90, 'pres': 2000})
+    assert describe(result, 0) == ["pres: out of range (870 to 1085)"]
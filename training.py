@@ -0,0 +1,184 @@
+# Training pipeline with warm-start growth and versioned model artifacts.
+#
+# `train` fits a fresh RandomForest on the reference dataset. `update` grows
+# the current model with extra trees fitted on a new labelled batch only
+# (warm_start), so new observations are folded in within seconds instead of a
+# full retrain. Every run is saved as models/model-vNNNN.pkl with a JSON
+# sidecar recording its lineage, and `publish` atomically replaces
+# refined_disaster_prediction_model.pkl with a version via os.replace. The
+# running app watches that file and swaps the new model in.
+#
+#   python training.py train --publish
+#   python training.py update new_observations.csv --estimators 10 --publish
+#   python training.py list
+#   python training.py publish 3
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from evaluation_cache import file_hash
+from scoring import DATA_PATH, MODEL_PATH, load_model, script_dir
+
+MODEL_DIR = os.path.join(script_dir, 'models')
+FEATURES = ['temp', 'wspd', 'rhum', 'pres']
+TARGET = 'disaster'
+# Parameters of the shipped model
+N_ESTIMATORS = 100
+RANDOM_STATE = 42
+# Trees added per warm-start update
+UPDATE_ESTIMATORS = 10
+
+_VERSION_RE = re.compile(r'model-v(\d+)\.pkl$')
+
+
+def load_labelled(path):
+    data = pd.read_csv(path)
+    missing = [column for column in FEATURES + [TARGET] if column not in data.columns]
+    if missing:
+        raise ValueError(f"Missing columns in {path}: {', '.join(missing)}")
+    data = data.dropna(subset=FEATURES + [TARGET])
+    return data[FEATURES], data[TARGET].astype(int).to_numpy()
+
+
+def train(X, y, n_estimators=N_ESTIMATORS, random_state=RANDOM_STATE):
+    from sklearn.ensemble import RandomForestClassifier
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=random_state)
+    model.fit(X, y)
+    return model
+
+
+# Add `extra` trees fitted on (X, y) to the model, keeping the existing ones.
+# The batch must contain every class the model knows, otherwise the new trees
+# would disagree with the old ones about the probability columns.
+def grow(model, X, y, extra=UPDATE_ESTIMATORS):
+    absent = [c.item() for c in model.classes_ if c not in set(np.unique(y))]
+    if absent:
+        raise ValueError(f"The new batch has no rows labelled {absent}; "
+                         "warm-start updates need every class present")
+    unknown = sorted(c.item() for c in set(np.unique(y)) - set(model.classes_))
+    if unknown:
+        raise ValueError(f"The new batch has labels the model does not know: {unknown}")
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra)
+    model.fit(X[list(model.feature_names_in_)], y)
+    model.set_params(warm_start=False)
+    return model
+
+
+# (version, path) of every saved artifact, oldest first
+def versions(model_dir=MODEL_DIR):
+    found = []
+    for path in glob.glob(os.path.join(model_dir, 'model-v*.pkl')):
+        match = _VERSION_RE.search(path)
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
+
+
+def version_path(version, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, f'model-v{version:04d}.pkl')
+
+
+def read_metadata(path):
+    try:
+        with open(os.path.splitext(path)[0] + '.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# Write the model as the next version, plus a JSON sidecar describing it
+def save_version(model, metadata, model_dir=MODEL_DIR):
+    os.makedirs(model_dir, exist_ok=True)
+    existing = versions(model_dir)
+    version = existing[-1][0] + 1 if existing else 1
+    path = version_path(version, model_dir)
+    tmp_path = path + '.tmp'
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
+    metadata = dict(metadata, version=version, sha256=file_hash(path), n_estimators=len(model.estimators_),
+                    created=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    with open(os.path.splitext(path)[0] + '.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return version, path
+
+
+# Atomically replace the live model file with an artifact. The copy is made
+# next to the target first so the final os.replace never crosses filesystems;
+# readers see either the old file or the new one, never a partial write.
+def publish(path, target=MODEL_PATH):
+    tmp_path = target + '.tmp'
+    shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train, grow and publish cloudburst models.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = commands.add_parser('train', help="fit a new forest on a labelled CSV")
+    train_parser.add_argument('data', nargs='?', default=DATA_PATH)
+    train_parser.add_argument('--estimators', type=int, default=N_ESTIMATORS)
+    train_parser.add_argument('--publish', action='store_true', help="make it the live model")
+
+    update_parser = commands.add_parser('update', help="grow the live model with trees fitted on a new batch")
+    update_parser.add_argument('data', help="labelled CSV of new observations")
+    update_parser.add_argument('--estimators', type=int, default=UPDATE_ESTIMATORS, help="trees to add")
+    update_parser.add_argument('--base', default=MODEL_PATH, help="model to grow (default: the live model)")
+    update_parser.add_argument('--publish', action='store_true', help="make it the live model")
+
+    commands.add_parser('list', help="show saved versions")
+
+    publish_parser = commands.add_parser('publish', help="make a saved version the live model")
+    publish_parser.add_argument('version', type=int)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        live = file_hash(MODEL_PATH) if os.path.exists(MODEL_PATH) else None
+        for version, path in versions():
+            metadata = read_metadata(path)
+            marker = '*' if metadata.get('sha256') == live else ' '
+            print(f"{marker} v{version:04d}  {metadata.get('kind', '?'):6}  "
+                  f"{metadata.get('n_estimators', '?'):>4} trees  {metadata.get('rows', '?'):>8} rows  "
+                  f"{metadata.get('created', '')}")
+        return
+
+    if args.command == 'publish':
+        path = version_path(args.version)
+        if not os.path.exists(path):
+            parser.error(f"No saved version {args.version}")
+        publish(path)
+        print(f"Published v{args.version:04d} to {MODEL_PATH}")
+        return
+
+    start = time.perf_counter()
+    X, y = load_labelled(args.data)
+    if args.command == 'train':
+        model = train(X, y, args.estimators)
+        metadata = {'kind': 'train', 'data': os.path.abspath(args.data), 'rows': len(y)}
+    else:
+        model = load_model(args.base)
+        metadata = {'kind': 'update', 'data': os.path.abspath(args.data), 'rows': len(y),
+                    'parent': file_hash(args.base)}
+        try:
+            model = grow(model, X, y, args.estimators)
+        except ValueError as e:
+            parser.error(str(e))
+    version, path = save_version(model, metadata)
+    print(f"Saved v{version:04d} ({len(model.estimators_)} trees, {len(y)} rows) to {path} "
+          f"in {time.perf_counter() - start:.2f}s")
+    if args.publish:
+        publish(path)
+        print(f"Published v{version:04d} to {MODEL_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# Vectorized validation of model inputs.
+#
+# A whole batch (DataFrame, 2-D array, list of dicts, or one dict) is checked
+# column by column in a single pass: values are coerced to float, and missing,
+# non-numeric, infinite and physically impossible readings are flagged per
+# cell in a bitmask instead of raising on the first bad value. Callers score
+# the rows in `valid` and report the rest with describe().
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+FEATURES = ['temp', 'wspd', 'rhum', 'pres']
+
+# Physically possible range of each feature, inclusive
+BOUNDS = {
+    'temp': (-90.0, 60.0),     # °C, beyond the recorded extremes
+    'wspd': (0.0, 410.0),      # km/h, above the strongest recorded gust
+    'rhum': (0.0, 100.0),      # %
+    'pres': (870.0, 1085.0),   # hPa, sea-level records
+}
+
+# Error bits per cell
+MISSING = 1
+NOT_NUMERIC = 2
+NOT_FINITE = 4
+OUT_OF_RANGE = 8
+
+MESSAGES = {
+    MISSING: "missing",
+    NOT_NUMERIC: "not a number",
+    NOT_FINITE: "not finite",
+    OUT_OF_RANGE: "out of range",
+}
+
+# values: (n, features) float64 with NaN wherever the cell is invalid
+# errors: (n, features) uint8 bitmask of the flags above
+# valid:  (n,) bool, True for rows without any error
+ValidationResult = namedtuple('ValidationResult', ['values', 'errors', 'valid', 'features'])
+
+
+def _as_frame(data, features):
+    if isinstance(data, pd.DataFrame):
+        return data
+    if isinstance(data, dict):
+        return pd.DataFrame([data])
+    if isinstance(data, (list, tuple)) and data and isinstance(data[0], dict):
+        return pd.DataFrame(list(data))
+    values = np.asarray(data)
+    if values.ndim == 1:
+        values = values.reshape(1, -1)
+    if values.ndim != 2 or values.shape[1] != len(features):
+        raise ValueError(f"Expected an array of shape (n, {len(features)}), got {values.shape}")
+    return pd.DataFrame(values, columns=features)
+
+
+# Coerce one column to float64 and flag its bad cells
+def _check_column(column, low, high):
+    errors = np.zeros(len(column), dtype=np.uint8)
+    if column.dtype.kind in 'fiub':
+        values = column.to_numpy(dtype=np.float64)
+        errors[np.isnan(values)] |= MISSING
+    else:
+        values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        # Only cells that failed to parse are looked at as text
+        failed = np.flatnonzero(np.isnan(values))
+        text = column.iloc[failed].astype('string').str.strip().str.lower()
+        empty = (text.isna() | text.isin(['', 'nan'])).to_numpy(dtype=bool)
+        errors[failed[empty]] |= MISSING
+        errors[failed[~empty]] |= NOT_NUMERIC
+    infinite = np.isinf(values)
+    errors[infinite] |= NOT_FINITE
+    with np.errstate(invalid='ignore'):
+        errors[~infinite & ((values < low) | (values > high))] |= OUT_OF_RANGE
+    return values, errors
+
+
+def validate(data, features=FEATURES, bounds=BOUNDS):
+    frame = _as_frame(data, features)
+    n = len(frame)
+    values = np.full((n, len(features)), np.nan)
+    errors = np.zeros((n, len(features)), dtype=np.uint8)
+    for j, feature in enumerate(features):
+        if feature not in frame.columns:
+            errors[:, j] = MISSING
+            continue
+        low, high = bounds.get(feature, (-np.inf, np.inf))
+        values[:, j], errors[:, j] = _check_column(frame[feature], low, high)
+    values[errors != 0] = np.nan
+    return ValidationResult(values, errors, ~errors.any(axis=1), list(features))
+
+
+# Human-readable problems of one row, e.g. ["pres: out of range (870 to 1085)"]
+def describe(result, row, bounds=BOUNDS):
+    problems = []
+    for j, feature in enumerate(result.features):
+        flags = int(result.errors[row, j])
+        for bit, message in MESSAGES.items():
+            if flags & bit:
+                if bit == OUT_OF_RANGE and feature in bounds:
+                    low, high = bounds[feature]
+                    message = f"{message} ({low:g} to {high:g})"
+                problems.append(f"{feature}: {message}")
+    return problems
+
+
+# Number of cells with each kind of error, per feature
+def summary(result):
+    return {feature: {message: int(np.count_nonzero(result.errors[:, j] & bit))
+                      for bit, message in MESSAGES.items()}
+            for j, feature in enumerate(result.features)}